@@ -1 +0,0 @@
-__version__ = "0.3"
\ No newline at end of file
@@ -1 +0,0 @@
-__all__ = ['data', 'ml', 'fast_weisfeiler_lehman', 'converter']
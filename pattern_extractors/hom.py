@@ -4,7 +4,9 @@ import argparse
 from ghc.homomorphism import get_hom_profile
 from ghc.utils.data import load_precompute, save_precompute,\
                            precompute_patterns_file_handle,\
-                           load_data_for_json, hom2json, save_json, load_precompute_patterns
+                           load_data_for_json, hom2json, save_json, load_precompute_patterns,\
+                           precompute_counts_file, precompute_work_dir
+from ghc.utils.checkpoint import ResumableRun
 
 
 
@@ -22,9 +24,23 @@ def compute_hom(passed_args=None):
     parser.add_argument('--hom_type', type=str, choices=hom_types)
     parser.add_argument('--dloc', type=str, default="./data")
     parser.add_argument('--oloc', type=str, default="./data")
+    parser.add_argument('--backend', type=str, default='homsub', choices=['homsub', 'homsub_batch', 'homsub_pool', 'dp', 'dp_batch'])
+    parser.add_argument('--n_jobs', type=int, default=1)
+    parser.add_argument('--exact', action='store_true', default=False)
+    parser.add_argument('--log', action='store_true', default=False)
+    parser.add_argument('--density', action='store_true', default=False)
+    parser.add_argument('--distinct_patterns', action='store_true', default=False)
+    parser.add_argument('--hom_cache', type=str, default=None)
+    parser.add_argument('--resume', action='store_true', default=False)
+    parser.add_argument('--timeout', type=float, default=None)
+    parser.add_argument('--cost_budget', type=float, default=None)
+    parser.add_argument('--overflow', type=str, default='filter', choices=['filter', 'reject', 'exact'])
+    parser.add_argument('--max_retry_rounds', type=int, default=10)
+    parser.add_argument('--max_retry_time', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=None,
+                        help='patterns are sampled reproducibly from the seed and the run id. Without a seed, each run draws fresh patterns')
 
     # arguments for compatibility reasons which are ignored
-    parser.add_argument('--seed', type=int, default=0)
     parser.add_argument('--epochs', type=int, default=5000)
     parser.add_argument('--bs', type=int, default=32)
     parser.add_argument('--lr', type=float, default=0.001)
@@ -51,6 +67,8 @@ def compute_hom(passed_args=None):
     else:
         args = parser.parse_args()
 
+    if args.density and not args.log:
+        parser.error('--density requires --log')
     
     
     if args.hom_size == -1:
@@ -73,17 +91,41 @@ def compute_hom(passed_args=None):
         
 
     except FileNotFoundError:
+        # with --resume, an interrupted run continues from its work directory
+        work_dir = precompute_work_dir(args.data.upper(), args.hom_type, args.hom_size, args.pattern_count, args.run_id, args.oloc) if args.resume else None
+        # the counts are visible in this file while they are computed. Its rows are the graph classes and its
+        # columns the patterns before filtering, hence it is removed once the features are saved
+        counts_file = precompute_counts_file(args.data.upper(), args.hom_type, args.hom_size, args.pattern_count, args.run_id, args.oloc)
+
         # changed it to batch computation to not recompute the patterns each time
         with precompute_patterns_file_handle(args.data.upper(), args.hom_type, args.hom_size, args.pattern_count, args.run_id, args.oloc) as f:
             homX = hom_func(graphs, 
                             size=args.hom_size, 
                             max_treewidth=args.max_treewidth,
-                            density=False, 
+                            density=args.density, 
                             seed=args.seed, 
+                            run_id=args.run_id,
                             pattern_count=args.pattern_count, 
                             pattern_file=f,
+                            backend=args.backend,
+                            n_jobs=args.n_jobs,
+                            exact=args.exact,
+                            log=args.log,
+                            distinct_patterns=args.distinct_patterns,
+                            hom_cache=args.hom_cache,
+                            result_file=counts_file,
+                            work_dir=work_dir,
+                            timeout=args.timeout,
+                            cost_budget=args.cost_budget,
+                            overflow=args.overflow,
+                            max_retry_rounds=args.max_retry_rounds,
+                            max_retry_time=args.max_retry_time,
                             )
         save_precompute(homX, args.data.upper(), args.hom_type, args.hom_size, args.pattern_count, args.run_id, args.oloc)
+        if os.path.exists(counts_file):
+            os.remove(counts_file)
+        if work_dir is not None:
+            ResumableRun(work_dir).remove()
 
         metas = hom2json(metas, homX, y)
         try:
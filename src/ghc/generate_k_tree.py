@@ -1,12 +1,26 @@
 import networkx as nx
 import random
+import hashlib
+import time
 import itertools
-
-from ghc.utils.HomSubio import HomSub, PACE_graph_format
+from functools import partial
+from contextlib import contextmanager
+
+from ghc.utils.HomSubio import HomSub, HomSubPool, PACE_graph_format, open_result_array, td_costs
+from ghc.utils.hom_dp import HomDP
+from ghc.utils.counting import count_patterns
+from ghc.utils.canonical import isomorphism_class
+from ghc.utils.homcache import HomCache
+from ghc.utils.checkpoint import ResumableRun
+from ghc.utils.modular import graph_degree_arrays, predicted_overflow
+from ghc.utils.tree_decomposition import pattern_tree_decomposition
+from ghc.utils.invariants import pattern_invariants
+from ghc.utils.graph_store import GraphStore, graph_sizes
 from ghc.utils.fast_weisfeiler_lehman import *
-from ghc.utils.converter import filter_overflow
+from ghc.utils.converter import filter_overflow, log_hom_features
 import numpy as np
 import scipy.spatial.distance as sp
+from scipy.stats import poisson
 from tqdm import tqdm
 import pickle
 
@@ -26,7 +40,7 @@ def random_ktree_decomposition(N, k, seed=None):
     T = nx.generators.random_tree(N-k, seed=seed)
     bfs = nx.bfs_edges(T, 0)
 
-    rnd = random.seed(seed)
+    rnd = random.Random(seed)
 
     # construct bags of a k-tree. The first bag consists of the first k+1 vertices and is fully connected
     bags = [None for _ in range(N-k)]
@@ -43,7 +57,7 @@ def random_ktree_decomposition(N, k, seed=None):
 
     for i, e in enumerate(bfs):
         bag = bags[e[0]].copy()
-        deleted_vertex = bag.pop(random.randint(0, k-1))
+        deleted_vertex = bag.pop(rnd.randint(0, k-1))
         new_vertex = candidates[i]
         for v in bag:
             edges.append((v, new_vertex))
@@ -63,11 +77,11 @@ def erdos_filter(edges, p=0.9, seed=None):
     '''Delete edges from edge list i.i.d. with probability 1-p.
     I.e., keep any edge with probability p'''
 
-    random.seed(seed)
+    rnd = random.Random(seed)
 
     filtered_edges = list()
     for e in edges:
-        if random.random() < p:
+        if rnd.random() < p:
             filtered_edges.append(e)
 
     return filtered_edges
@@ -80,52 +94,198 @@ def connected_filter(P):
     return S
 
 
-def partial_ktree_sample(N, k, p, seed=None):
-    '''Returns a list of networkx graphs that are the connected components of a 
-    partial ktree that was obtained by deleting edges with probability p from a 
-    random k tree on N vertices. '''
-
-    edges, td, string = random_ktree_decomposition(N, k, seed=seed)
-    filtered_edges = erdos_filter(edges, p=p, seed=seed)
-    filtered_graph = nx.empty_graph(n=N)
-    filtered_graph.add_edges_from(filtered_edges)
-    # connected_components = connected_filter(filtered_graph)
-
-    return filtered_graph, string
-
-
-def Nk_strategy_geom(max_size, pattern_count, p='by_max'):
+def random_tree_parents(sequences, n):
+    '''Decode the [nbatch, n-2] array of Pruefer sequences of trees on n nodes in lockstep. 
+    Returns an [nbatch, n] array order of the tree nodes, starting at the root, such that 
+    every node comes after its parent, and the [nbatch, n] array of parents (the parent of 
+    the root is -1).'''
+    nbatch = sequences.shape[0]
+    parents = -np.ones([nbatch, n], dtype=np.int64)
+    if n == 1:
+        return np.zeros([nbatch, 1], dtype=np.int64), parents
+    rows = np.arange(nbatch)
+    degrees = np.ones([nbatch, n], dtype=np.int64)
+    np.add.at(degrees, (np.repeat(rows, n - 2), sequences.ravel()), 1)
+
+    removed = np.zeros([nbatch, n - 1], dtype=np.int64)
+    for i in range(n - 2):
+        # the smallest leaf is attached to the next node of the sequence
+        leaves = np.argmax(degrees == 1, axis=1)
+        parents[rows, leaves] = sequences[:, i]
+        degrees[rows, leaves] = 0
+        degrees[rows, sequences[:, i]] -= 1
+        removed[:, i] = leaves
+    # the last two nodes are joined, the larger one is the root
+    last = degrees == 1
+    leaves = np.argmax(last, axis=1)
+    root = n - 1 - np.argmax(last[:, ::-1], axis=1)
+    parents[rows, leaves] = root
+    removed[:, -1] = leaves
+
+    # leaves are removed before their parents, hence the reversed removal order is top down
+    order = np.hstack([root[:, None], removed[:, ::-1]])
+    return order, parents
+
+
+class PartialKTrees:
+    '''Batch of partial k-trees and their tree decompositions as compact arrays, see
+    sample_partial_ktrees. networkx graphs and PACE strings are created on demand.
+
+    For pattern i, sizes[i] and treewidths[i] are N and k, edges[i] is the [m, 2] edge
+    array on the vertices 0..N-1, bags[i] is the [N-k, k+1] array of the bags and
+    td_edges[i] the [N-k-1, 2] edge array of the tree decomposition (bag 0 is its root).'''
+
+    def __init__(self, sizes, treewidths, edges, bags, td_edges):
+        self.sizes = sizes
+        self.treewidths = treewidths
+        self.edges = edges
+        self.bags = bags
+        self.td_edges = td_edges
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def graph(self, i):
+        pattern = nx.empty_graph(n=int(self.sizes[i]))
+        pattern.add_edges_from(self.edges[i].tolist())
+        return pattern
+
+    def td_string(self, i):
+        '''Tree decomposition of pattern i in PACE format, as returned by random_ktree_decomposition'''
+        bags = self.bags[i]
+        lines = [f's td {bags.shape[0]} {bags.shape[1]} {self.sizes[i]}']
+        lines += [f'b {t + 1} ' + ' '.join([str(v + 1) for v in bag]) for t, bag in enumerate(bags.tolist())]
+        lines += [f'{u + 1} {v + 1}' for u, v in np.sort(self.td_edges[i], axis=1).tolist()]
+        return '\n'.join(lines) + '\n'
+
+
+def run_key(run_id):
+    '''Integer for a run id, which may be an int or an arbitrary string'''
+    try:
+        return int(run_id)
+    except (TypeError, ValueError):
+        return int(hashlib.sha1(str(run_id).encode()).hexdigest()[:15], 16)
+
+
+def pattern_rngs(draws, seed=None, run_id=0, stream=0):
+    '''One independent numpy Generator per draw (index) of a pattern sampling stream.
+
+    The generator of draw j only depends on (seed, run_id, stream, j). Hence, draws can be 
+    generated in any order, in batches of any size or in parallel workers and are identical
+    to a serial run. If seed is None, fresh entropy is used.'''
+    return [np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(run_key(run_id), stream, j))) for j in draws]
+
+
+def sample_partial_ktrees(sizes, treewidths, p=0.9, rngs=None):
+    '''Vectorized version of random_ktree_decomposition followed by erdos_filter for a batch 
+    of sizes and treewidths.
+
+    Patterns with the same (N, k) are sampled in lockstep: random trees for the tree
+    decompositions are drawn as Pruefer sequences, the bags are built top down, where each
+    bag drops a random vertex of its parent bag (but not the vertex that was added last,
+    as in random_ktree_decomposition) and adds a new one, and edges are deleted i.i.d.
+    with probability 1-p. Returns a PartialKTrees object in the order of sizes.
+
+    rngs is a list of one numpy Generator per pattern (default: unseeded). All random
+    numbers of pattern i are drawn from rngs[i], hence a pattern does not depend on 
+    the other patterns in the batch.'''
+    if rngs is None:
+        rngs = [np.random.default_rng() for _ in sizes]
+    sizes = np.asarray(sizes, dtype=np.int64)
+    treewidths = np.asarray(treewidths, dtype=np.int64)
+    if np.any(treewidths > sizes - 1):
+        raise ValueError('k+1 cannot be larger than N')
+
+    edges = [None for _ in sizes]
+    bags = [None for _ in sizes]
+    td_edges = [None for _ in sizes]
+    shapes, inverse = np.unique(np.stack([sizes, treewidths], axis=1), axis=0, return_inverse=True)
+    for s, (N, k) in enumerate(shapes):
+        batch = np.flatnonzero(inverse.ravel() == s)
+        nbatch, nbags = len(batch), N - k
+        rows = np.arange(nbatch)
+        nedges = k * (k + 1) // 2 + (nbags - 1) * k
+
+        # the random numbers of each pattern: Pruefer sequence, deleted bag positions and edge filter
+        sequences = np.empty([nbatch, max(nbags - 2, 0)], dtype=np.int64)
+        deletions = np.empty([nbatch, nbags - 1], dtype=np.int64)
+        uniforms = np.empty([nbatch, nedges])
+        for b, i in enumerate(batch):
+            sequences[b] = rngs[i].integers(0, nbags, size=sequences.shape[1])
+            deletions[b] = rngs[i].integers(0, max(k, 1), size=nbags - 1)
+            uniforms[b] = rngs[i].random(nedges)
+
+        order, parents = random_tree_parents(sequences, nbags)
+
+        # number the bags top down, such that parent_bag[:, t] < t
+        position = np.empty_like(order)
+        position[rows[:, None], order] = np.arange(nbags)
+        parent_bag = np.take_along_axis(np.where(parents < 0, 0, position[rows[:, None], parents]), order, axis=1)
+
+        # the first bag is a clique on the first k+1 vertices
+        batch_bags = np.empty([nbatch, nbags, k + 1], dtype=np.int64)
+        batch_bags[:, 0] = np.arange(k + 1)
+        batch_edges = [np.broadcast_to(np.array(list(itertools.combinations(range(k + 1), 2)), dtype=np.int64).reshape(-1, 2), (nbatch, k * (k + 1) // 2, 2))]
+        for t in range(1, nbags):
+            parent = batch_bags[rows, parent_bag[:, t]]
+            kept = parent[np.arange(k + 1) != deletions[:, t - 1, None]].reshape(nbatch, k)
+            new_vertex = np.full([nbatch, 1], k + t)
+            batch_bags[:, t] = np.hstack([kept, new_vertex])
+            batch_edges.append(np.stack([kept, np.broadcast_to(new_vertex, kept.shape)], axis=2))
+        batch_edges = np.concatenate(batch_edges, axis=1)
+        keep = uniforms < p
+
+        batch_td_edges = np.stack([parent_bag[:, 1:], np.broadcast_to(np.arange(1, nbags), (nbatch, nbags - 1))], axis=2)
+        for b, i in enumerate(batch):
+            edges[i] = batch_edges[b][keep[b]]
+            bags[i] = batch_bags[b]
+            td_edges[i] = batch_td_edges[b]
+
+    return PartialKTrees(sizes, treewidths, edges, bags, td_edges)
+
+
+def Nk_strategy_geom(max_size, pattern_count, p='by_max', rng=None):
+
+    if rng is None:
+        rng = np.random.default_rng()
 
     if p == 'by_max':
         p = 1. - 1. / max_size
 
     # draw sizes from uniform distribution
-    sizes = np.random.randint(2, max_size+1, size=pattern_count)
+    sizes = rng.integers(2, max_size+1, size=pattern_count)
 
     # draw treewidths from geometric distribution, but bounded by size - 1
-    treewidths = np.random.default_rng().geometric(p=p, size=pattern_count)
+    treewidths = rng.geometric(p=p, size=pattern_count)
     treewidths = np.where(treewidths<sizes-1, treewidths, sizes - 1)
 
     return sizes, treewidths
 
 
-def Nk_strategy_poisson(max_size, pattern_count, lam='by_max'):
+def Nk_strategy_poisson(max_size, pattern_count, lam='by_max', rng=None):
+
+    if rng is None:
+        rng = np.random.default_rng()
 
     if lam == 'by_max':
         lam = (1. + 3 * np.log(max_size)) / max_size
 
     # draw sizes from uniform distribution
-    sizes = np.random.randint(2, max_size+1, size=pattern_count)
+    sizes = rng.integers(2, max_size+1, size=pattern_count)
 
     # draw treewidths from geometric distribution, but bounded by size - 1
-    treewidths = 1 + np.random.default_rng().poisson(lam=lam, size=pattern_count)
+    treewidths = 1 + rng.poisson(lam=lam, size=pattern_count)
     treewidths = np.where(treewidths<sizes-1, treewidths, sizes - 1)
 
     return sizes, treewidths
 
 
-def Nk_strategy_fiddly(max_size, pattern_count, lam='by_max', min_size=0):
-    '''This is the proposed samping strategy for in expectation polynomial run time that is proposed in the paper'''
+def Nk_strategy_fiddly(max_size, pattern_count, lam='by_max', min_size=0, rng=None, max_treewidth=None):
+    '''This is the proposed samping strategy for in expectation polynomial run time that is proposed in the paper.
+    If max_treewidth is given, treewidths are additionally bounded by it.'''
+
+    if rng is None:
+        rng = np.random.default_rng()
 
     # we want to be polynomial time in expectation
     if lam == 'by_max':
@@ -135,62 +295,270 @@ def Nk_strategy_fiddly(max_size, pattern_count, lam='by_max', min_size=0):
     p = 1 - np.power(0.01, 1. / (max_size - min_size))
 
     # draw sizes from geometric distribution
-    sizes = np.random.default_rng().geometric(p=p, size=pattern_count) + min_size
+    sizes = rng.geometric(p=p, size=pattern_count) + min_size
 
     # draw treewidths from poisson distribution, but bounded by size - 1
-    treewidths = np.random.randint(1, 4, size=pattern_count) + np.random.default_rng().poisson(lam=lam, size=pattern_count)
+    treewidths = rng.integers(1, 4, size=pattern_count) + rng.poisson(lam=lam, size=pattern_count)
     treewidths = np.where(treewidths<sizes-1, treewidths, sizes - 1)
+    if max_treewidth is not None:
+        treewidths = np.where(treewidths<max_treewidth, treewidths, max_treewidth)
+
+    return sizes, treewidths
+
+
+def Nk_strategy_fiddly_uniform(max_size, uniforms, lam='by_max', min_size=0, max_treewidth=None):
+    '''Nk_strategy_fiddly for a batch of draws, given an [ndraws, 3] array of uniform samples
+    in [0, 1), one row per draw. The geometric, uniform and poisson samples of all draws are 
+    computed at once by inverting their distribution functions.'''
+
+    if lam == 'by_max':
+        lam = (1. + np.log(max_size)) / max_size
+
+    p = 1 - np.power(0.01, 1. / (max_size - min_size))
+
+    # P(floor(log(1-u) / log(1-p)) >= k) = (1-p)^k
+    sizes = np.floor(np.log1p(-uniforms[:, 0]) / np.log1p(-p)).astype(np.int64) + 1 + min_size
+
+    # poisson.ppf(0) is -1
+    treewidths = 1 + np.floor(3 * uniforms[:, 1]).astype(np.int64) + np.maximum(poisson.ppf(uniforms[:, 2], lam), 0).astype(np.int64)
+    treewidths = np.where(treewidths<sizes-1, treewidths, sizes - 1)
+    if max_treewidth is not None:
+        treewidths = np.where(treewidths<max_treewidth, treewidths, max_treewidth)
 
     return sizes, treewidths
 
 
 # this is currently our default selection strategy for pattern sizes and treewidths
 Nk_strategy = Nk_strategy_fiddly
+# and its batch version, which draw_patterns uses
+Nk_strategy_uniform = Nk_strategy_fiddly_uniform
 
 
 def get_small_patterns():
-    singleton, td_singleton = partial_ktree_sample(N=1, k=0, p=1)
-    edge, td_edge = partial_ktree_sample(N=2, k=1, p=1)
-    path, td_path = partial_ktree_sample(N=3, k=1, p=1)
-    tria, td_tria = partial_ktree_sample(N=3, k=2, p=1)
-    return [singleton, edge, path, tria], [td_singleton, td_edge, td_path, td_tria]
+    # singleton, edge, path, and triangle. These k-trees are unique, hence no seed is necessary
+    batch = sample_partial_ktrees([1, 2, 3, 3], [0, 1, 1, 2], p=1)
+    return [batch.graph(i) for i in range(4)], [batch.td_string(i) for i in range(4)]
+
+
+def draw_patterns(size, draws, min_size=0, p=0.9, seed=None, run_id=0, stream=0, max_treewidth=None):
+    '''Sample the partial k-trees with the given draw indices of a sampling stream, where 
+    sizes and treewidths (at most max_treewidth, if given) are drawn by Nk_strategy_uniform 
+    for all draws at once. Returns a PartialKTrees object.
+
+    Each draw uses its own generator, see pattern_rngs. E.g., draw_patterns(size, range(0, 10)) 
+    equals the concatenation of draw_patterns(size, range(0, 4)) and draw_patterns(size, range(4, 10)),
+    such that ranges of draws can be sampled by parallel workers.'''
+    rngs = pattern_rngs(draws, seed=seed, run_id=run_id, stream=stream)
+    uniforms = np.array([rng.random(3) for rng in rngs]).reshape(-1, 3)
+    sizes, treewidths = Nk_strategy_uniform(size, uniforms, 'by_max', min_size=min_size, max_treewidth=max_treewidth)
+    return sample_partial_ktrees(sizes, treewidths, p=p, rngs=rngs)
+
+
+def get_pattern_list(size, pattern_count, min_size=0, distinct=False, max_attempts=None, graphs=None, cost_budget=None, reject_overflow=False, seed=None, run_id=0, stream=0, recompute_td=True, max_treewidth=None):
+    '''Sample pattern_count partial k-trees of treewidth at most max_treewidth (if given) 
+    and their tree decompositions.
+
+    The j-th draw is sampled with the generator of (seed, run_id, stream, j), see pattern_rngs,
+    hence the patterns are reproducible for a fixed seed. Calls that should give different 
+    patterns, e.g., resampling rounds, should use different streams.
+
+    If distinct is True, samples that are isomorphic to a pattern in the list are 
+    redrawn. As there may be fewer isomorphism classes than requested patterns for small 
+    sizes, duplicates are kept after max_attempts (default: 100 * pattern_count) draws.
+
+    If cost_budget is given, samples whose estimated cost of counting in all graphs (the 
+    sum of td_costs over the dataset) exceeds cost_budget are redrawn, up to max_attempts. 
+    The distribution of the estimated costs of the returned patterns is reported.
 
+    If reject_overflow is True, samples whose counts may overflow int64 in one of the graphs
+    (see predicted_overflow) are redrawn, up to max_attempts.
 
-def get_pattern_list(size, pattern_count, min_size=0):
+    As deleting edges from the k-tree often lowers the treewidth, the tree decomposition is
+    recomputed for the pattern if recompute_td is True, see pattern_tree_decomposition. The
+    decomposition of the k-tree is kept if it is not wider.'''
     
     partial_ktree_edge_keeping_p = 0.9
-    
-    # TODO: handling possibly disconnected patterns, now. 
-    # this function can be simplified
+
+    if max_attempts is None:
+        max_attempts = 100 * pattern_count
+    if (cost_budget is not None or reject_overflow) and graphs is None:
+        raise ValueError('a cost budget or overflow rejection requires the graphs')
+    if reject_overflow:
+        degree_arrays = graph_degree_arrays(graphs)
+    if cost_budget is not None:
+        vertex_counts, edge_counts = [a.astype(np.float64) for a in graph_sizes(graphs)]
+    buckets = dict()
+    representatives = list()
+    attempts = 0
+    redrawn = 0
+    rejected = 0
+    overflowing = 0
+    costs = list()
+
     kt_list = list()
     td_list = list()
     while len(kt_list) < pattern_count:
-        
-        sizes, treewidths = Nk_strategy(size, 1, 'by_max', min_size=min_size)
-        pattern, td = partial_ktree_sample(N=sizes[0], k=treewidths[0], p=partial_ktree_edge_keeping_p)
 
-        kt_list += [pattern]
-        td_list += [td]
+        # draw the missing patterns as one batch
+        batch = draw_patterns(size, range(attempts, attempts + pattern_count - len(kt_list)), min_size=min_size, 
+                              p=partial_ktree_edge_keeping_p, seed=seed, run_id=run_id, stream=stream, max_treewidth=max_treewidth)
+        for i in range(len(batch)):
+            pattern = batch.graph(i)
+            td = batch.td_string(i)
+            if recompute_td:
+                td = pattern_tree_decomposition(pattern, td=td)
+            attempts += 1
+
+            # once the attempts are used up, expensive patterns and duplicates are kept
+            if cost_budget is not None:
+                cost = np.sum(td_costs(td, vertex_counts, edge_counts))
+                if cost > cost_budget and attempts <= max_attempts:
+                    rejected += 1
+                    continue
+
+            if reject_overflow and attempts <= max_attempts and np.any(predicted_overflow([pattern], *degree_arrays)):
+                overflowing += 1
+                continue
+
+            if distinct:
+                _, new = isomorphism_class(pattern, buckets, representatives)
+                if not new and attempts <= max_attempts:
+                    redrawn += 1
+                    continue
+
+            # the invariants are kept with the pattern and allow to skip zero counts, see zero_pairs
+            pattern_invariants(pattern)
+            kt_list += [pattern]
+            td_list += [td]
+            if cost_budget is not None:
+                costs.append(cost)
+
+    if distinct:
+        print(f'NOTE drew {attempts} patterns to obtain {len(representatives)} distinct patterns, {redrawn} isomorphic copies were redrawn')
+    if reject_overflow:
+        print(f'NOTE rejected {overflowing} of {attempts} patterns whose counts may overflow int64')
+    if cost_budget is not None:
+        quantiles = np.percentile(costs, [0, 50, 90, 100]) if len(costs) > 0 else np.zeros(4)
+        print(f'NOTE rejected {rejected} of {attempts} patterns above the cost budget {cost_budget:.3g}. ' 
+              f'Estimated costs: total {np.sum(costs):.3g}, min {quantiles[0]:.3g}, median {quantiles[1]:.3g}, 90% {quantiles[2]:.3g}, max {quantiles[3]:.3g}')
         
     kt_list = kt_list[:pattern_count] # the above might result in more than pattern_count patterns
     td_list = td_list[:pattern_count]
     return kt_list, td_list
 
 
-def min_kernel(graphs, size='max', density=False, seed=8, pattern_count=50, early_stopping=10, metadata=None, pattern_file=None, **kwargs):
+def min_kernel(graphs, size='max', density=False, seed=None, pattern_count=50, early_stopping=10, metadata=None, pattern_file=None, **kwargs):
     patterns = random_ktree_profile(graphs, size=size, density=density, seed=seed, pattern_count=pattern_count, early_stopping=early_stopping, metadata=metadata, pattern_file=pattern_file,
                                 # this is what we really fix for the min_kernel
                                 min_embedding=True, add_small_patterns=True, **kwargs)
     return patterns
 
 
-def full_kernel(graphs, size='max', density=False, seed=8, pattern_count=50, early_stopping=10, metadata=None, pattern_file=None, **kwargs):
+def full_kernel(graphs, size='max', density=False, seed=None, pattern_count=50, early_stopping=10, metadata=None, pattern_file=None, **kwargs):
     patterns = random_ktree_profile(graphs, size=size, density=density, seed=seed, pattern_count=pattern_count, early_stopping=early_stopping, metadata=metadata, pattern_file=pattern_file,
                                 # this is what we really fix for the full_kernel
                                 min_embedding=False, add_small_patterns=True, **kwargs)
     return patterns
 
 
+def failed_patterns(hom_counts):
+    '''Boolean masks of the columns (patterns) of hom_counts with a failed count (-1, e.g., a
+    backend error or timeout) and of the other columns with an overflowed (negative) count.'''
+    failed = np.any(hom_counts == -1, axis=0)
+    overflowed = ~failed & (np.min(hom_counts, axis=0, initial=0) < 0)
+    return failed, overflowed
+
+
+def graph_classes(graph_list):
+    '''Representatives of the isomorphism classes of the (unlabeled) graphs and the class of
+    each graph, such that counts of the representatives are copied to all graphs by indexing
+    their rows with the classes. The representatives of a GraphStore are a GraphStore, too.'''
+    unique, inverse = graph_isomorphism_classes(graph_list)
+    print(f'NOTE counting homomorphisms into {len(unique)} isomorphism classes of {len(graph_list)} graphs')
+    if isinstance(graph_list, GraphStore):
+        return graph_list.subset(unique), inverse
+    return [graph_list[i] for i in unique], inverse
+
+
+def count_per_graph_class(count_homs):
+    '''Wrap count_homs such that homomorphisms are counted once per isomorphism class of 
+    the (unlabeled) graphs and the rows are copied to all graphs of the class, see graph_classes. 
+    The classes of the last graph_list are kept for repeated calls.'''
+    last = dict()
+
+    def count(graph_list, out=None, columns=None, **kwargs):
+        if last.get('graph_list') is not graph_list:
+            unique_graphs, inverse = graph_classes(graph_list)
+            last.update(graph_list=graph_list, unique_graphs=unique_graphs, inverse=inverse)
+        hom_counts = count_homs(graph_list=last['unique_graphs'], **kwargs)[last['inverse']]
+        if out is None:
+            return hom_counts
+        # rows of out are per graph, hence it is filled once all classes are counted
+        out[:, np.arange(hom_counts.shape[1]) if columns is None else columns] = hom_counts
+        return out
+
+    return count
+
+
+@contextmanager
+def get_count_backend(backend, n_jobs=1, fast_paths=True, exact=False, log=False, hom_cache=None, dedup_graphs=True, timeout=None):
+    '''Context manager that provides the function that computes the 
+    homomorphism count matrix.
+
+    'homsub' calls the external HomSub binary for each pair, 'homsub_batch' 
+    calls an executable once per pattern in batch mode on graphs sorted by size, 'homsub_pool' keeps n_jobs
+    worker processes alive until the context is left (both use PROTOCOL_EXECUTABLE, as the HomSub 
+    binary does not support their protocols), 'dp' runs the tree decomposition 
+    dynamic program in process, and 'dp_batch' runs it on batches of graphs of similar size 
+    at once (see HomDP with batch_graphs=True), which is faster for many small graphs.
+
+    If fast_paths is True, trees and cycles are counted without the backend,
+    see count_patterns. 
+    
+    If exact is True, counts are exact python ints that never overflow. If log is True, 
+    counts are natural logarithms of the homomorphism counts. Both are only supported 
+    by the 'dp' and 'dp_batch' backends.
+    
+    hom_cache is the path of an SQLite file that keeps counts across runs, see HomCache.
+
+    If dedup_graphs is True, counts are computed once per isomorphism class of graphs, 
+    see count_per_graph_class.
+
+    timeout is an optional time limit in seconds per pair for the 'homsub' and 
+    'homsub_batch' backends. Pairs that exceed it are marked as failed (-1).'''
+    if exact and backend not in ['dp', 'dp_batch']:
+        raise ValueError(f'exact counting is not supported by backend {backend}')
+    if log and backend not in ['dp', 'dp_batch']:
+        raise ValueError(f'log counting is not supported by backend {backend}')
+    if exact and log:
+        raise ValueError('exact and log counting are mutually exclusive')
+    if timeout is not None and backend not in ['homsub', 'homsub_batch']:
+        raise ValueError(f'timeouts are not supported by backend {backend}')
+
+    if backend == 'homsub':
+        count_homs = partial(HomSub, timeout=timeout)
+    elif backend == 'homsub_batch':
+        count_homs = partial(HomSub, batch=True, sort_by_size=True, timeout=timeout)
+    elif backend == 'homsub_pool':
+        count_homs = HomSubPool(n_jobs=n_jobs)
+    elif backend == 'dp':
+        count_homs = partial(HomDP, exact=exact, log=log)
+    elif backend == 'dp_batch':
+        count_homs = partial(HomDP, exact=exact, log=log, batch_graphs=True)
+    else:
+        raise ValueError(f'unknown backend {backend}')
+
+    cache = HomCache(hom_cache) if hom_cache is not None else None
+    try:
+        count = partial(count_patterns, count_homs, fast_paths=fast_paths, state=dict(), exact=exact, log=log, cache=cache)
+        yield count_per_graph_class(count) if dedup_graphs else count
+    finally:
+        if backend == 'homsub_pool':
+            count_homs.close()
+        if cache is not None:
+            cache.close()
+
+
 # def filter_overflow(patterns):
 #     minval = np.min(patterns, axis=0)
 #     patterns = patterns[:, minval >= 0]
@@ -201,49 +569,141 @@ def full_kernel(graphs, size='max', density=False, seed=8, pattern_count=50, ear
 #         return np.zeros([patterns.shape[0], 1])
 
 
-def random_ktree_profile(graphs, size='max', density=False, seed=8, pattern_count=50, early_stopping=10, metadata=None, min_embedding=True, add_small_patterns=False, pattern_file=None, filter_and_retry=True, **kwargs):
+def random_ktree_profile(graphs, size='max', density=False, seed=None, pattern_count=50, early_stopping=10, metadata=None, min_embedding=True, add_small_patterns=False, pattern_file=None, filter_and_retry=True, backend='homsub', n_jobs=1, fast_paths=True, exact=False, log=False, distinct_patterns=False, hom_cache=None, dedup_graphs=True, result_file=None, work_dir=None, timeout=None, cost_budget=None, overflow='filter', max_retry_rounds=10, max_retry_time=None, run_id=0, max_treewidth=None, **kwargs):
     '''
 
     Parameters:
         - add_small_patterns: If true, the first four patterns will be the singleton, the edge, the wedge, and the triangle. Further samples will have size at least four.
+        - backend: 'homsub', 'homsub_batch', 'homsub_pool', 'dp', or 'dp_batch', see get_count_backend
+        - n_jobs: number of concurrent workers used for counting
+        - fast_paths: if True, tree and cycle patterns are counted without the backend
+        - exact: if True, counts are exact python ints (requires the 'dp' or 'dp_batch' backend) and no overflow filtering is necessary
+        - log: if True, features are log hom(F,G) (requires the 'dp' or 'dp_batch' backend), or log homomorphism densities if density is True. Zero counts are -inf, see log_hom_features
+        - distinct_patterns: if True, sampled patterns that are isomorphic to an earlier sample are redrawn. Isomorphic patterns are counted only once in any case.
+        - hom_cache: path of an SQLite file in which counts are kept across runs, see HomCache
+        - dedup_graphs: if True, counts are computed once per isomorphism class of the (unlabeled) graphs
+        - timeout: time limit in seconds per pair for the 'homsub' and 'homsub_batch' backends, pairs that exceed it count as failed
+        - cost_budget: sampled patterns whose estimated number of DP operations over all graphs exceeds the budget are redrawn, see get_pattern_list
+        - result_file: path of a .npy file that is memory mapped and receives the counts of the initial patterns while they are computed (not for exact counts). Rows are the counted graphs, i.e., one per isomorphism class if dedup_graphs is True.
+        - work_dir: directory in which patterns, counts, and a completion bitmap are kept, such that an interrupted run resumes with the missing pairs, see ResumableRun (not for exact counts)
+        - overflow: how to deal with counts that do not fit into int64. 'filter' removes patterns with overflowed (negative) counts after counting and samples new ones. 
+          'reject' redraws patterns at sampling time whose counts may overflow according to a degree based bound (see predicted_overflow). 
+          'exact' counts such patterns exactly with the 'dp' backend, the result is then an object array.
+        - max_retry_rounds, max_retry_time: bound the number of rounds and the time in seconds that filter_and_retry spends on counting replacement patterns
+        - seed, run_id: patterns are sampled reproducibly from (seed, run_id), see pattern_rngs. Different runs with the same seed get independent patterns. 
+          If seed is None (default), each call draws fresh patterns.
+        - max_treewidth: if given, sampled patterns have treewidth at most max_treewidth
     '''
 
+    if exact and work_dir is not None:
+        raise ValueError('exact counts cannot be resumed from a work directory')
+
     if size == 'max':
-        size = max([len(g.nodes) for g in graphs])
+        size = int(np.max(graph_sizes(graphs)[0]))
     
     if size == 'half_max':
-        size = max([len(g.nodes) for g in graphs]) / 2
+        size = int(np.max(graph_sizes(graphs)[0])) / 2
 
-    
+    run = ResumableRun(work_dir) if work_dir is not None else None
+    resumed = run.load_patterns() if run is not None else None
 
-    if add_small_patterns:
+    min_pattern_size = 4 if add_small_patterns else 0
+    if resumed is not None:
+        # count the same patterns as the interrupted run
+        kt_list, td_list = resumed
+    elif add_small_patterns:
         # the 4 patterns of size 1-3 are added deterministically and do not need to be sampled
         # hence we reduce the pattern count and increase the min pattern size
-        min_pattern_size = 4
-        kt_list, td_list = get_pattern_list(size, pattern_count=pattern_count - 4, min_size=min_pattern_size)
+        kt_list, td_list = get_pattern_list(size, pattern_count=pattern_count - 4, min_size=min_pattern_size, distinct=distinct_patterns, graphs=graphs, cost_budget=cost_budget, reject_overflow=overflow == 'reject', seed=seed, run_id=run_id, max_treewidth=max_treewidth)
         kt_small, td_small = get_small_patterns()
         kt_list = kt_small + kt_list
         td_list = td_small + td_list
     else:
         # just sample the requested number of patterns
-        min_pattern_size = 0
-        kt_list, td_list = get_pattern_list(size, pattern_count=pattern_count - 4, min_size=min_pattern_size)
-
-    # compute homomorphism counts
-    embeddings = HomSub(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding)
+        kt_list, td_list = get_pattern_list(size, pattern_count=pattern_count, min_size=min_pattern_size, distinct=distinct_patterns, graphs=graphs, cost_budget=cost_budget, reject_overflow=overflow == 'reject', seed=seed, run_id=run_id, max_treewidth=max_treewidth)
+    if run is not None and resumed is None:
+        run.save_patterns(kt_list, td_list)
 
-    # here, we remove patterns for which the homcount overflowed and resample new patterns if necessary
-    # TODO: note that this process might take very long to terminate if we frequently draw patterns which overflow the homcounts
-    if filter_and_retry:
-        embeddings, kt_list = filter_overflow(embeddings, kt_list)
-        while embeddings.shape[1] < pattern_count:
-            kt_tmp, td_tmp = get_pattern_list(size, pattern_count=pattern_count - embeddings.shape[1], min_size=min_pattern_size)
-            embeddings_tmp = HomSub(pattern_list=kt_tmp, graph_list=graphs, td_list=td_tmp, min_embedding=min_embedding)
-            embeddings_tmp, kt_tmp = filter_overflow(embeddings, kt_tmp)
-
-            # append new filtered patterns
-            kt_list = kt_list + kt_tmp
-            embeddings = np.hstack([embeddings, embeddings])
+    # counts are computed once per isomorphism class of graphs and the rows are copied afterwards
+    if dedup_graphs:
+        count_graphs, inverse = graph_classes(graphs)
+    else:
+        count_graphs = graphs
+        inverse = np.arange(len(graphs))
+
+    degree_arrays = graph_degree_arrays(count_graphs) if overflow == 'exact' and not exact and not log else None
+
+    def count_patterns_safely(count_homs, kt, td, out=None, done=None):
+        # only patterns whose counts may overflow are counted exactly
+        risky = np.zeros(len(kt), dtype=bool)
+        if degree_arrays is not None:
+            risky = np.any(predicted_overflow(kt, *degree_arrays), axis=0)
+        if out is None and np.any(risky):
+            out = np.zeros([len(count_graphs), len(kt)], dtype=np.int64)
+        safe = np.nonzero(~risky)[0]
+        counts = count_homs(pattern_list=[kt[jp] for jp in safe], graph_list=count_graphs, td_list=[td[jp] for jp in safe], 
+                            min_embedding=min_embedding, n_jobs=n_jobs, out=out, columns=safe if out is not None else None, done=done)
+        if isinstance(out, np.memmap):
+            out.flush()
+        if out is not None:
+            counts = np.array(out)
+        if np.any(risky):
+            print(f'NOTE counting {np.sum(risky)} patterns whose counts may overflow int64 exactly')
+            counts = counts.astype(object)
+            with get_count_backend('dp', n_jobs=n_jobs, fast_paths=fast_paths, exact=True, dedup_graphs=False) as count_exact:
+                counts[:, risky] = count_exact(pattern_list=[kt[jp] for jp in np.nonzero(risky)[0]], graph_list=count_graphs, 
+                                               td_list=[td[jp] for jp in np.nonzero(risky)[0]], min_embedding=min_embedding, n_jobs=n_jobs)
+        return counts
+
+    with get_count_backend(backend, n_jobs=n_jobs, fast_paths=fast_paths, exact=exact, log=log, hom_cache=hom_cache, dedup_graphs=False, timeout=timeout) as count_homs:
+        # compute homomorphism counts
+        done = None
+        if run is not None:
+            out, done = run.open_counts([len(count_graphs), len(kt_list)], dtype=np.float64 if log else np.int64)
+        elif result_file is not None and not exact:
+            out = open_result_array(result_file, [len(count_graphs), len(kt_list)], dtype=np.float64 if log else np.int64)
+        else:
+            out = None
+        embeddings = count_patterns_safely(count_homs, kt_list, td_list, out=out, done=done)
+        if run is not None:
+            run.flush()
+
+        # here, we remove patterns for which the homcount failed or overflowed and count replacement patterns 
+        # until pattern_count patterns are complete, or max_retry_rounds or max_retry_time are used up
+        # exact and log counts never overflow
+        if filter_and_retry and not exact and not log:
+            failed, overflowed = failed_patterns(embeddings)
+            keep = ~failed & ~overflowed
+            embeddings = embeddings[:, keep]
+            kt_list = [p for p, k in zip(kt_list, keep) if k]
+            print(f'NOTE {np.sum(failed)} of {len(keep)} patterns failed, {np.sum(overflowed)} overflowed')
+
+            start = time.time()
+            rounds = 0
+            while embeddings.shape[1] < pattern_count and rounds < max_retry_rounds \
+                  and (max_retry_time is None or time.time() - start < max_retry_time):
+                rounds += 1
+                kt_tmp, td_tmp = get_pattern_list(size, pattern_count=pattern_count - embeddings.shape[1], min_size=min_pattern_size, distinct=distinct_patterns, graphs=graphs, cost_budget=cost_budget, reject_overflow=overflow == 'reject', seed=seed, run_id=run_id, max_treewidth=max_treewidth, stream=rounds)
+                embeddings_tmp = count_patterns_safely(count_homs, kt_tmp, td_tmp)
+
+                # append the new patterns that neither failed nor overflowed
+                failed, overflowed = failed_patterns(embeddings_tmp)
+                keep = ~failed & ~overflowed
+                kt_list = kt_list + [p for p, k in zip(kt_tmp, keep) if k]
+                embeddings = np.hstack([embeddings, embeddings_tmp[:, keep]])
+                print(f'NOTE retry round {rounds}: {np.sum(failed)} of {len(keep)} new patterns failed, {np.sum(overflowed)} overflowed, '
+                      f'{embeddings.shape[1]} of {pattern_count} patterns after {time.time() - start:.1f}s')
+
+            if embeddings.shape[1] < pattern_count:
+                print(f'WARNING only {embeddings.shape[1]} of {pattern_count} patterns without failure or overflow after {rounds} retry rounds')
+            if embeddings.shape[1] == 0:
+                # if nothing worked, return zeros
+                embeddings = np.zeros([embeddings.shape[0], 1])
+
+    embeddings = embeddings[inverse]
+
+    if log:
+        embeddings = log_hom_features(embeddings, [len(p.nodes) for p in kt_list], graph_sizes(graphs)[0], density=density)
 
     # store patterns and return output
     if pattern_file is not None:
@@ -252,18 +712,30 @@ def random_ktree_profile(graphs, size='max', density=False, seed=8, pattern_coun
 
 
 
-def random_ktree_profile_relative_to_wl(graphs, size='max', density=False, seed=8, pattern_count=50, early_stopping=10, metadata=None, min_embedding=True, add_small_patterns=False, pattern_file=None, **kwargs):
+def random_ktree_profile_relative_to_wl(graphs, size='max', density=False, seed=None, pattern_count=50, early_stopping=10, metadata=None, min_embedding=True, add_small_patterns=False, pattern_file=None, backend='homsub', n_jobs=1, fast_paths=True, exact=False, log=False, distinct_patterns=False, hom_cache=None, dedup_graphs=True, timeout=None, cost_budget=None, run_id=0, max_treewidth=None, **kwargs):
     '''
 
     Parameters:
         - add_small_patterns: If true, the first four patterns will be the singleton, the edge, the wedge, and the triangle. Further samples will have size at least four.
+        - backend: 'homsub', 'homsub_batch', 'homsub_pool', 'dp', or 'dp_batch', see get_count_backend
+        - n_jobs: number of concurrent workers used for counting
+        - fast_paths: if True, tree and cycle patterns are counted without the backend
+        - exact: if True, counts are exact python ints (requires the 'dp' or 'dp_batch' backend) and no overflow filtering is necessary
+        - log: if True, features are log hom(F,G) (requires the 'dp' or 'dp_batch' backend), or log homomorphism densities if density is True. Zero counts are -inf, see log_hom_features
+        - distinct_patterns: if True, sampled patterns that are isomorphic to an earlier sample are redrawn. Isomorphic patterns are counted only once in any case.
+        - hom_cache: path of an SQLite file in which counts are kept across runs, see HomCache
+        - dedup_graphs: if True, counts are computed once per isomorphism class of the (unlabeled) graphs
+        - timeout: time limit in seconds per pair for the 'homsub' and 'homsub_batch' backends, pairs that exceed it count as failed
+        - cost_budget: sampled patterns whose estimated number of DP operations over all graphs exceeds the budget are redrawn, see get_pattern_list
+        - seed, run_id: patterns are sampled reproducibly from (seed, run_id), see pattern_rngs. If seed is None (default), each call draws fresh patterns.
+        - max_treewidth: if given, sampled patterns have treewidth at most max_treewidth
     '''
 
     if size == 'max':
-        size = max([len(g.nodes) for g in graphs])
+        size = int(np.max(graph_sizes(graphs)[0]))
     
     if size == 'half_max':
-        size = max([len(g.nodes) for g in graphs]) / 2
+        size = int(np.max(graph_sizes(graphs)[0])) / 2
 
     if add_small_patterns:
         min_pattern_size = 4
@@ -271,81 +743,88 @@ def random_ktree_profile_relative_to_wl(graphs, size='max', density=False, seed=
         min_pattern_size = 0
 
 
-    if pattern_count > -1:
-        # return the requested number of patterns
-        kt_list, td_list = get_pattern_list(size, pattern_count, min_size=min_pattern_size)
+    with get_count_backend(backend, n_jobs=n_jobs, fast_paths=fast_paths, exact=exact, log=log, hom_cache=hom_cache, dedup_graphs=dedup_graphs, timeout=timeout) as count_homs:
+        if pattern_count > -1:
+            # return the requested number of patterns
+            kt_list, td_list = get_pattern_list(size, pattern_count, min_size=min_pattern_size, distinct=distinct_patterns, graphs=graphs, cost_budget=cost_budget, seed=seed, run_id=run_id, max_treewidth=max_treewidth)
 
-        if add_small_patterns:
-            kt_small, td_small = get_small_patterns()
-            kt_list = kt_small + kt_list
-            td_list = td_small + td_list
+            if add_small_patterns:
+                kt_small, td_small = get_small_patterns()
+                kt_list = kt_small + kt_list
+                td_list = td_small + td_list
 
-        if pattern_file is not None:
-            pickle.dump(kt_list, pattern_file)
+            if pattern_file is not None:
+                pickle.dump(kt_list, pattern_file)
 
-        return HomSub(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding)
+            embeddings = count_homs(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding, n_jobs=n_jobs)
+            if log:
+                embeddings = log_hom_features(embeddings, [len(p.nodes) for p in kt_list], graph_sizes(graphs)[0], density=density)
+            return embeddings
     
-    else:
-        # adjust pattern count wrt. expressive power on input data. the negative number gives the n_iter of wl
-        pattern_list = list()
-
-        if metadata is not None:
-            # we know the training split 
-            # we want to be not transductive, but truly inductive
-            traingraphs = list()
-            train_idx = list()
-            for graph, meta in zip(graphs, metadata):
-                if meta['split'] == 'train':
-                    traingraphs.append(graph)
-                    train_idx.append(meta['idx'])
-
-            wl_nodelabels = homsub_format_wl_nodelabels(traingraphs, vertex_features=None, n_iter=-pattern_count)
-            wl_representations = np.array([np.sum(g, axis=0) for g in wl_nodelabels])
         else:
-            # use full dataset for wl adjustment
-            wl_nodelabels = homsub_format_wl_nodelabels(graphs, vertex_features=None, n_iter=-pattern_count)
-            wl_representations = np.array([np.sum(g, axis=0) for g in wl_nodelabels])
-
-        if add_small_patterns:
-            kt_list, td_list = get_small_patterns()
-            pattern_list += kt_list
-            hom_representations = HomSub(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding)
-            if metadata is not None:
-                hom_comp_reps = hom_representations[train_idx, :]
-            else:
-                hom_comp_reps = hom_representations
-            comparison = compare_equivalence_classes(filter_overflow(hom_comp_reps), wl_representations)
-        else:
-            hom_representations = None
-            comparison = -1
-
-        stop_step = 0
-        while comparison < 0:
-
-            kt_list, td_list = get_pattern_list(size, 1, min_size=min_pattern_size)
-            pattern_list += kt_list
-            new_emb = HomSub(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding)
-            if hom_representations is None:
-                hom_representations = new_emb
-            else:
-                hom_representations = np.hstack([hom_representations, new_emb])
+            # adjust pattern count wrt. expressive power on input data. the negative number gives the n_iter of wl
+            pattern_list = list()
 
             if metadata is not None:
-                hom_comp_reps = hom_representations[train_idx, :]
+                # we know the training split 
+                # we want to be not transductive, but truly inductive
+                traingraphs = list()
+                train_idx = list()
+                for graph, meta in zip(graphs, metadata):
+                    if meta['split'] == 'train':
+                        traingraphs.append(graph)
+                        train_idx.append(meta['idx'])
+
+                wl_nodelabels = homsub_format_wl_nodelabels(traingraphs, vertex_features=None, n_iter=-pattern_count)
+                wl_representations = np.array([np.sum(g, axis=0) for g in wl_nodelabels])
             else:
-                hom_comp_reps = hom_representations
-
-            comparison_new = compare_equivalence_classes(filter_overflow(hom_comp_reps), wl_representations)
-            if comparison_new <= comparison:
-                stop_step += 1
+                # use full dataset for wl adjustment
+                wl_nodelabels = homsub_format_wl_nodelabels(graphs, vertex_features=None, n_iter=-pattern_count)
+                wl_representations = np.array([np.sum(g, axis=0) for g in wl_nodelabels])
+
+            if add_small_patterns:
+                kt_list, td_list = get_small_patterns()
+                pattern_list += kt_list
+                hom_representations = count_homs(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding, n_jobs=n_jobs)
+                if metadata is not None:
+                    hom_comp_reps = hom_representations[train_idx, :]
+                else:
+                    hom_comp_reps = hom_representations
+                comparison = compare_equivalence_classes(filter_overflow(hom_comp_reps, pattern_list)[0], wl_representations)
             else:
-                stop_step = 0
+                hom_representations = None
+                comparison = -1
+
+            stop_step = 0
+            while comparison < 0:
+
+                # each step samples from its own stream
+                kt_list, td_list = get_pattern_list(size, 1, min_size=min_pattern_size, graphs=graphs, cost_budget=cost_budget, seed=seed, run_id=run_id, max_treewidth=max_treewidth, stream=len(pattern_list) + 1)
+                pattern_list += kt_list
+                new_emb = count_homs(pattern_list=kt_list, graph_list=graphs, td_list=td_list, min_embedding=min_embedding, n_jobs=n_jobs)
+                if hom_representations is None:
+                    hom_representations = new_emb
+                else:
+                    hom_representations = np.hstack([hom_representations, new_emb])
+
+                if metadata is not None:
+                    hom_comp_reps = hom_representations[train_idx, :]
+                else:
+                    hom_comp_reps = hom_representations
+
+                comparison_new = compare_equivalence_classes(filter_overflow(hom_comp_reps, pattern_list)[0], wl_representations)
+                if comparison_new <= comparison:
+                    stop_step += 1
+                else:
+                    stop_step = 0
             
-            comparison = comparison_new
-            if stop_step >= early_stopping:
-                break
-
-        print(f'NOTE hom representations have shape {hom_representations.shape} to be as powerful as wl with n_iter={-pattern_count} (shape={wl_representations.shape}).\n  wl has {np.unique(wl_representations, axis=0).shape[0]} unique reps, hom has {np.unique(hom_representations, axis=0).shape[0]} unique reps')
-        if pattern_file is not None:
-            pickle.dump(pattern_list, pattern_file)
-        return hom_representations
+                comparison = comparison_new
+                if stop_step >= early_stopping:
+                    break
+
+            print(f'NOTE hom representations have shape {hom_representations.shape} to be as powerful as wl with n_iter={-pattern_count} (shape={wl_representations.shape}).\n  wl has {np.unique(wl_representations, axis=0).shape[0]} unique reps, hom has {np.unique(hom_representations, axis=0).shape[0]} unique reps')
+            if pattern_file is not None:
+                pickle.dump(pattern_list, pattern_file)
+            if log:
+                hom_representations = log_hom_features(hom_representations, [len(p.nodes) for p in pattern_list], graph_sizes(graphs)[0], density=density)
+            return hom_representations
@@ -8,13 +8,25 @@ import sys
 import subprocess
 import tempfile
 import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
+from ghc.utils.graph_store import GraphStore, graph_edges, graph_sizes
 
 
-def HomSub(pattern_list, graph_list, td_list, verbose=False, min_embedding=False):
+
+# path of the HomSub binary, relative to the directory python is started from
+HOMSUB_EXECUTABLE = './HomSub/experiments-build/experiments/experiments'
+
+# the HomSub binary does not implement the batch (-batch) and worker (-serve) protocols, hence 
+# HomSub in batch mode and HomSubPool default to their implementation in ghc.utils.hom_dp
+PROTOCOL_EXECUTABLE = [sys.executable, '-m', 'ghc.utils.hom_dp']
+
+
+def HomSub(pattern_list, graph_list, td_list, verbose=False, min_embedding=False, n_jobs=1, batch=False, batch_size=None, executable=None, pair_mask=None, sort_by_size=False, out=None, columns=None, done=None, order_by_cost=True, timeout=None):
     '''Compute homomorphism counts for a batch of patterns and a batch of 
     (transaction) graphs using HomSub. For each pattern-transaction pair selected for 
-    computation, we call HomSub anew.
+    computation, we call HomSub anew, unless batch is True.
 
     min_embedding: If True, for each (transaction) graph, we use only those patterns that
         have smaller or equal size. This implements the min-kernel as 
@@ -23,69 +35,316 @@ def HomSub(pattern_list, graph_list, td_list, verbose=False, min_embedding=False
         patterns. This implements a standard kernel which is likely useful 
         for feeding into an MLP
 
+    n_jobs: Number of HomSub processes that run concurrently.
+
+    batch: If True, HomSub is called in batch mode (-batch) once per pattern and 
+        per batch_size graphs. It reads the graphs as a stream of concatenated PACE 
+        graphs from stdin and prints one count per graph. This requires an executable 
+        that supports the batch protocol, such as ghc.utils.hom_dp.
+
+    executable: The HomSub command as list of arguments. Defaults to HOMSUB_EXECUTABLE, 
+        or to PROTOCOL_EXECUTABLE in batch mode.
+
+    pair_mask: Optional boolean array of shape [ngraphs, npatterns]. Only pairs for which it
+        is True are counted, all other counts remain zero.
+
+    sort_by_size: If True, graphs are processed in order of increasing size, such that 
+        batches contain graphs of similar size.
+
+    out, columns, done: Optional preallocated result array and completion bitmap, see 
+        result_array. Counts are written to out and marked in done as soon as each HomSub 
+        call returns. Failed calls are not marked.
+
+    order_by_cost: If True, HomSub calls are started in order of decreasing estimated cost 
+        (see pair_costs), such that a few expensive pairs do not dominate the end of the run.
+
+    timeout: Optional time limit in seconds per pair (per graph in batch mode). Calls that
+        exceed it are killed and their counts are marked as failed (-1).
+
     Files which are used to communicate data between Python and HomSub
-    are written to a temp folder. '''
+    are written to a temp folder. HomSub expects the tree decomposition of the pattern 
+    in a file named tam.out in its working directory. Hence, each pattern gets its own 
+    working directory inside the temp folder where its tree decomposition is written once.
+    This way, concurrent HomSub calls, and concurrent runs started from the same folder, 
+    do not interfere. '''
 
-    # output_directory = tempfile.mkdtemp()
-    graph_directory = tempfile.mkdtemp()
-        
-    # store patterns and graphs
-    write_PACE_graphs(graph_list, folder=graph_directory, prefix='graph')
-    write_PACE_graphs(pattern_list, folder=graph_directory, prefix='pattern')
+    # the temp folder is removed with all files once the counts are complete
+    with tempfile.TemporaryDirectory() as graph_directory:
+        # store patterns and graphs
+        if batch:
+            graph_strings = PACE_graph_strings(graph_list)
+        else:
+            write_PACE_graphs(graph_list, folder=graph_directory, prefix='graph')
+        write_PACE_graphs(pattern_list, folder=graph_directory, prefix='pattern')
+        pattern_directories = write_PACE_tds(td_list, folder=graph_directory, prefix='pattern')
 
-    # invoke DISC and collect issues
-    cwd = './'
+        if executable is None:
+            executable = list(PROTOCOL_EXECUTABLE) if batch else [os.path.abspath(HOMSUB_EXECUTABLE)]
 
-    # files = [f for f in filter(lambda x: x.endswith('.txt'), os.listdir(graph_directory))]
-    # files.sort(key=lambda f: int(re.sub('\D', '', f)))
-    
+        ngraphs = len(graph_list)
+        npatterns = len(pattern_list)
+
+        # only the required pairs are submitted, all other counts remain zero
+        # a job consists of a pattern and the list of graphs that are counted in a single HomSub call
+        required = required_pairs(pattern_list, graph_list, min_embedding=min_embedding, pair_mask=pair_mask)
+        graph_order = graph_size_order(graph_list) if sort_by_size else np.arange(ngraphs)
+        jobs = list()
+        for jp in range(npatterns):
+            graph_ids = graph_order[required[graph_order, jp]]
+            if batch:
+                step = len(graph_ids) if batch_size is None else batch_size
+                jobs += [(jp, graph_ids[i:i+step]) for i in range(0, len(graph_ids), max(step, 1))]
+            else:
+                jobs += [(jp, graph_ids[i:i+1]) for i in range(len(graph_ids))]
+
+        if order_by_cost:
+            # longest job first
+            costs = pair_costs(pattern_list, graph_list, td_list)
+            jobs.sort(key=lambda job: -np.sum(costs[job[1], job[0]]))
+
+        def count(job):
+            jp, graph_ids = job
+            if verbose:
+                sys.stderr.write(f'pattern_{jp} n={len(pattern_list[jp].nodes)} m={len(pattern_list[jp].edges)}, graphs {graph_ids[0]}..{graph_ids[-1]} ({len(graph_ids)})' + '\n')
 
-    ngraphs = len(graph_list)
-    npatterns = len(pattern_list)
-    with open(os.path.join(graph_directory, 'features.csv'), 'w') as features:
-        for ig in tqdm(range(ngraphs)):
-            for jp in range(npatterns):
-
-                # HomSub expects a tree decomposition of the pattern in a file named tam.out
-                with open('tam.out', 'w') as td_file:
-                    td_file.write(td_list[jp])
-
-                if verbose:
-                    sys.stderr.write(f'pattern_{jp} n={len(pattern_list[jp].nodes)} m={len(pattern_list[jp].edges)}, graph_{ig} n={len(graph_list[ig].nodes)} m={len(graph_list[ig].edges)}' + '\n')
-                
-                args = ['./HomSub/experiments-build/experiments/experiments',
-                        '-count-hom',
-                        '-h', os.path.join(graph_directory, f'pattern_{jp}.gr'), 
-                        '-g', os.path.join(graph_directory, f'graph_{ig}.gr')]
-                try:
-                    if min_embedding:
-                        # for the min_embedding, we don't need to compute a count for patterns larger than the current graph 
-                        if len(graph_list[ig].nodes) >= len(pattern_list[jp].nodes):  
-                            if verbose:
-                                sys.stderr.write('doing it\n')             
-                            report = subprocess.run(args, cwd=cwd, stdout=features, stderr=sys.stderr, text=True, check=True)
-                        else:
-                            if verbose:
-                                sys.stderr.write('skipping it\n')                            
-                            features.write('0\n')
-                    else:
-                        report = subprocess.run(args, cwd=cwd, stdout=features, stderr=sys.stderr, text=True, check=True)
-                    features.flush()
-                except subprocess.CalledProcessError as e:
-                    sys.stderr.write(f'{e}')
-                    features.write('-1\n')
-
-    # homcounts get large. HomSub uses long long int, 
-    # but it's unclear how large this is on any given system. 
-    # so we use int128, as we use this lateron anyways.
-    # note that hom_counts might still contain overflowed values from HomSub
-    # filter at your own expense.
-    hom_counts = np.loadtxt(os.path.join(graph_directory, 'features.csv'), dtype=np.int64).reshape([ngraphs, npatterns])
-
-    # return everything
-    return hom_counts
+            args = executable + ['-count-hom', '-h', os.path.join(graph_directory, f'pattern_{jp}.gr')]
+            if batch:
+                args += ['-batch', '-g', '-']
+                stdin = ''.join([graph_strings[ig] for ig in graph_ids])
+            else:
+                args += ['-g', os.path.join(graph_directory, f'graph_{graph_ids[0]}.gr')]
+                stdin = None
+            try:
+                report = subprocess.run(args, cwd=pattern_directories[jp], input=stdin, stdout=subprocess.PIPE, stderr=sys.stderr, text=True, check=True,
+                                        timeout=None if timeout is None else timeout * len(graph_ids))
+                counts = [int(c) for c in report.stdout.split()]
+                if len(counts) != len(graph_ids):
+                    raise ValueError(f'HomSub returned {len(counts)} counts for {len(graph_ids)} graphs')
+                return counts
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError) as e:
+                sys.stderr.write(f'{e}')
+                return None
+
+        # homcounts get large. HomSub uses long long int, 
+        # but it's unclear how large this is on any given system. 
+        # note that hom_counts might still contain overflowed values from HomSub
+        # filter at your own expense.
+        hom_counts, columns = result_array([ngraphs, npatterns], out=out, columns=columns, done=done)
+
+        # HomSub runs in separate processes, hence threads suffice to keep n_jobs of them busy
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            for (jp, graph_ids), c in zip(jobs, tqdm(pool.map(count, jobs), total=len(jobs))):
+                if c is None:
+                    # failed calls are marked by -1
+                    hom_counts[graph_ids, columns[jp]] = -1
+                else:
+                    hom_counts[graph_ids, columns[jp]] = c
+                    if done is not None:
+                        done[graph_ids, columns[jp]] = True
+
+        # return everything
+        return hom_counts
     
 
+class HomSubPool:
+    '''Long-lived HomSub worker processes that receive graphs, patterns with their
+    tree decompositions, and counting jobs over stdin and stream counts back over stdout.
+    No temp files are involved. Graphs and patterns are sent to a worker only once per 
+    lifetime of the pool, hence repeated calls with the same graphs (e.g. one pattern at 
+    a time) only pay for the counting.
+
+    The line protocol is documented in ghc.utils.hom_dp.serve, which also implements it. 
+    The pool is callable with the same arguments as HomSub and should be closed after 
+    use, e.g. by using it as a context manager.
+
+    executable: The command as list of arguments. It must support the protocol and defaults
+        to PROTOCOL_EXECUTABLE. The workers are started with the additional argument -serve. '''
+
+    def __init__(self, n_jobs=1, executable=None):
+        if executable is None:
+            executable = list(PROTOCOL_EXECUTABLE)
+        self.workers = [subprocess.Popen(executable + ['-serve'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, 
+                                         stderr=sys.stderr, text=True) 
+                        for _ in range(n_jobs)]
+        # per worker, the ids of the graphs and patterns that it already knows
+        self.known = [set() for _ in self.workers]
+        # keep references to all patterns that were sent, such that their ids stay unique. 
+        # Graphs are identified by a hash of their PACE format instead, such that no 
+        # (materialized) graph is kept alive
+        self.sent = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for worker in self.workers:
+            if worker.poll() is None:
+                worker.stdin.write('quit\n')
+                worker.stdin.close()
+                worker.wait()
+        self.workers = list()
+
+    def __call__(self, pattern_list, graph_list, td_list, verbose=False, min_embedding=False, chunk_size=256, pair_mask=None, sort_by_size=False, out=None, columns=None, done=None, order_by_cost=True, **kwargs):
+        '''Compute the [ngraphs, npatterns] matrix of homomorphism counts, 
+        analogously to HomSub. Graphs are distributed round robin over the workers 
+        (in order of increasing size if sort_by_size is True). If order_by_cost is True, 
+        graphs are instead assigned to the least loaded worker in order of decreasing 
+        estimated cost (see pair_costs), and each worker processes its most expensive 
+        pairs first.'''
+
+        ngraphs = len(graph_list)
+        npatterns = len(pattern_list)
+        hom_counts, columns = result_array([ngraphs, npatterns], out=out, columns=columns, done=done)
+        required = required_pairs(pattern_list, graph_list, min_embedding=min_embedding, pair_mask=pair_mask)
+        graph_order = graph_size_order(graph_list) if sort_by_size else np.arange(ngraphs)
+        nworkers = len(self.workers)
+        node_counts, edge_counts = graph_sizes(graph_list)
+        if order_by_cost:
+            costs = np.where(required, pair_costs(pattern_list, graph_list, td_list), 0)
+            worker_graphs = longest_processing_time_first(np.sum(costs, axis=1), nworkers)
+        else:
+            worker_graphs = [graph_order[w::nworkers] for w in range(nworkers)]
+
+        def run(w):
+            worker = self.workers[w]
+            known = self.known[w]
+            graph_ids = dict()
+            jobs = list()
+            for ig in worker_graphs[w]:
+                jobs += [(ig, jp) for jp in np.nonzero(required[ig])[0]]
+            if order_by_cost:
+                jobs.sort(key=lambda job: -costs[job])
+
+            # send requests in chunks and read the answers of each chunk before
+            # sending the next, such that none of the pipes runs full
+            for i in range(0, len(jobs), chunk_size):
+                chunk = jobs[i:i+chunk_size]
+                request = list()
+                for ig, jp in chunk:
+                    p = pattern_list[jp]
+                    if ig not in graph_ids:
+                        n, edges = graph_edges(graph_list, ig)
+                        string = PACE_edges_format(n, edges)
+                        graph_ids[ig] = hashlib.sha1(string.encode()).hexdigest()
+                        if ('g', graph_ids[ig]) not in known:
+                            request.append(f'graph {graph_ids[ig]}\n' + string)
+                            known.add(('g', graph_ids[ig]))
+                    if ('p', id(p)) not in known:
+                        request.append(f'pattern {id(p)}\n' + PACE_graph_format(p) + td_list[jp].strip() + '\n')
+                        known.add(('p', id(p)))
+                    self.sent[id(p)] = p
+                    request.append(f'count {id(p)} {graph_ids[ig]}\n')
+                    if verbose:
+                        sys.stderr.write(f'pattern_{jp} n={len(p.nodes)} m={len(p.edges)}, graph_{ig} n={node_counts[ig]} m={edge_counts[ig]}' + '\n')
+                worker.stdin.write(''.join(request))
+                worker.stdin.flush()
+                for ig, jp in chunk:
+                    answer = worker.stdout.readline()
+                    if answer == '':
+                        raise RuntimeError(f'HomSub worker {w} terminated unexpectedly')
+                    hom_counts[ig, columns[jp]] = int(answer)
+                    if done is not None:
+                        done[ig, columns[jp]] = True
+            return len(jobs)
+
+        # workers are separate processes, hence one thread per worker suffices to keep them busy
+        with ThreadPoolExecutor(max_workers=len(self.workers)) as pool:
+            for _ in tqdm(pool.map(run, range(len(self.workers))), total=len(self.workers)):
+                pass
+
+        return hom_counts
+
+
+def required_pairs(pattern_list, graph_list, min_embedding=False, pair_mask=None):
+    '''Boolean [ngraphs, npatterns] mask of the pairs that need to be counted. For the 
+    min_embedding, patterns larger than the graph are not counted (their count is zero).'''
+    required = np.ones([len(graph_list), len(pattern_list)], dtype=bool)
+    if min_embedding:
+        pattern_sizes = np.array([p.number_of_nodes() for p in pattern_list], dtype=np.int64)
+        required &= graph_sizes(graph_list)[0][:, None] >= pattern_sizes[None, :]
+    if pair_mask is not None:
+        required &= pair_mask
+    return required
+
+
+def result_array(shape, dtype=np.int64, fill=0, out=None, columns=None, done=None):
+    '''Return the array into which the [ngraphs, npatterns] counts of shape are written,
+    and the column of the array for each pattern.
+
+    If out is None, a new array is allocated. Otherwise, the counts of pattern jp are 
+    written to column columns[jp] of out (default: jp), which allows several calls to 
+    fill one preallocated (e.g. memory mapped, see open_result_array) array.
+
+    done is an optional boolean array of the same shape as out that marks the pairs whose 
+    counts are complete, e.g. from an interrupted earlier run. Their counts are kept.'''
+    if out is None:
+        return np.full(shape, fill, dtype=dtype), np.arange(shape[1])
+    columns = np.arange(shape[1]) if columns is None else np.asarray(columns)
+    if done is None:
+        out[:, columns] = fill
+    else:
+        out[:, columns] = np.where(done[:, columns], out[:, columns], fill)
+    return out, columns
+
+
+def open_result_array(path, shape, dtype=np.int64, fill=0):
+    '''Create a memory mapped .npy file for a result array. Counts that are written to it
+    are visible to other processes (e.g. np.load(path, mmap_mode='r')) while the 
+    computation is running. Object arrays (exact counts) cannot be memory mapped.'''
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    out[:] = fill
+    return out
+
+
+def td_header(td):
+    '''Number of bags and largest bag size (treewidth + 1) of a tree decomposition in PACE format'''
+    for line in td.splitlines():
+        tokens = line.split()
+        if len(tokens) > 0 and tokens[0] == 's':
+            return int(tokens[2]), int(tokens[3])
+    raise ValueError('tree decomposition has no header line')
+
+
+def td_costs(td, n, m):
+    '''Estimated cost of counting a pattern with tree decomposition td (PACE format) in 
+    graphs with n vertices and m edges (arrays), see pair_costs.'''
+    nbags, bag_size = td_header(td)
+    n = np.maximum(np.asarray(n, dtype=np.float64), 1)
+    return nbags * n ** (bag_size - 1) * np.maximum(m, n)
+
+
+def pair_costs(pattern_list, graph_list, td_list):
+    '''Estimated relative cost of counting each [graph, pattern] pair.
+
+    The dynamic program over a tree decomposition with bags of size at most b fills a table 
+    of up to n^b entries per bag. In sparse graphs, only tuples that contain an edge 
+    contribute, hence the estimate is (number of bags) * n^(b-1) * max(m, n).'''
+    n, m = [a.astype(np.float64) for a in graph_sizes(graph_list)]
+    # without a tree decomposition, assume a single bag with all vertices
+    tds = [f's td 1 {len(p.nodes)} {len(p.nodes)}\n' if td is None else td for p, td in zip(pattern_list, td_list)]
+    return np.stack([td_costs(td, n, m) for td in tds], axis=1).reshape(len(graph_list), len(pattern_list))
+
+
+def longest_processing_time_first(costs, nworkers):
+    '''Assign jobs (by index) with the given costs to nworkers, taking the most expensive 
+    job first and giving it to the least loaded worker. Returns one index array per worker.'''
+    loads = np.zeros(nworkers)
+    assignment = [list() for _ in range(nworkers)]
+    for i in np.argsort(-np.asarray(costs), kind='stable'):
+        w = np.argmin(loads)
+        assignment[w].append(i)
+        loads[w] += costs[i]
+    return [np.array(a, dtype=np.int64) for a in assignment]
+
+
+def graph_size_order(graph_list):
+    '''Indices of the graphs in order of increasing number of vertices'''
+    return np.argsort(graph_sizes(graph_list)[0], kind='stable')
+
+
 def PACE_graph_format(g):
     string = f'p tw {len(g.nodes)} {len(g.edges)}\n'
     string += '\n'.join([f'{min(e[0], e[1]) + 1} {max(e[0], e[1]) + 1}' for e in g.edges])
@@ -93,13 +352,62 @@ def PACE_graph_format(g):
     return string
 
 
+def PACE_edges_format(n, edges):
+    '''PACE_graph_format of a graph on n vertices given by an [m, 2] array of 0-based edges'''
+    edges = np.sort(np.asarray(edges, dtype=np.int64).reshape(-1, 2), axis=1) + 1
+    string = f'p tw {n} {len(edges)}\n'
+    string += '\n'.join([f'{u} {v}' for u, v in edges.tolist()])
+    string += '\n'
+    return string
+
+
+def PACE_graph_strings(graph_list):
+    '''PACE format of each graph. The graphs of a GraphStore are written from its edge 
+    arrays without creating networkx graphs.'''
+    if isinstance(graph_list, GraphStore):
+        return [PACE_edges_format(*graph_edges(graph_list, ig)) for ig in range(len(graph_list))]
+    return [PACE_graph_format(g) for g in graph_list]
+
+
+def read_PACE_graphs(lines):
+    '''Parse a stream of concatenated PACE graphs, as written by PACE_graph_format,
+    and yield (number of vertices, list of 0-based edges) for each graph.'''
+    n = None
+    m = 0
+    edges = list()
+    for line in lines:
+        tokens = line.split()
+        if len(tokens) == 0 or tokens[0] == 'c':
+            continue
+        if tokens[0] == 'p':
+            n, m = int(tokens[2]), int(tokens[3])
+            edges = list()
+        else:
+            edges.append((int(tokens[0]) - 1, int(tokens[1]) - 1))
+        if n is not None and len(edges) == m:
+            yield n, edges
+            n = None
+
+
 def write_PACE_graphs(graphs, folder, prefix):
-    for i, g in enumerate(graphs):
-        string = PACE_graph_format(g)
+    for i, string in enumerate(PACE_graph_strings(graphs)):
         with open(os.path.join(folder, f'{prefix}_{i}.gr'), 'w') as f:
             f.write(string)
 
 
+def write_PACE_tds(tds, folder, prefix):
+    '''Write each tree decomposition to a file named tam.out in its own subfolder
+    and return the list of subfolders.'''
+    directories = list()
+    for i, td in enumerate(tds):
+        directory = os.path.join(folder, f'{prefix}_{i}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'tam.out'), 'w') as f:
+            f.write(td)
+        directories.append(directory)
+    return directories
+
+
 if __name__ == '__main__':
 
     # create_fixed_pattern_set()
@@ -1 +1 @@
-__all__ = ['data', 'ml', 'fast_weisfeiler_lehman', 'converter']
+__all__ = ['data', 'ml', 'fast_weisfeiler_lehman', 'converter', 'hom_dp', 'fast_hom', 'counting', 'modular', 'canonical', 'homcache', 'tree_decomposition', 'invariants', 'graph_store']
@@ -0,0 +1,43 @@
+import numpy as np
+import networkx as nx
+
+
+def pattern_certificate(pattern):
+    '''Isomorphism invariant of a pattern. Isomorphic patterns have equal certificates,
+    but patterns with equal certificates are not necessarily isomorphic.'''
+    degrees = ','.join([str(d) for d in sorted(d for _, d in pattern.degree)])
+    return f'{pattern.number_of_nodes()}:{pattern.number_of_edges()}:{degrees}:{nx.weisfeiler_lehman_graph_hash(pattern)}'
+
+
+def isomorphism_class(pattern, buckets, representatives, certificate=None):
+    '''Return the id of the isomorphism class of pattern, and whether the class is new.
+
+    representatives is the list of one pattern per known class (the id is the position
+    in this list) and buckets maps certificates to the ids of the classes that have this
+    certificate. Both are updated if the pattern belongs to a new class. If certificate 
+    is None, pattern_certificate is used.'''
+    if certificate is None:
+        certificate = pattern_certificate(pattern)
+    for i in buckets.get(certificate, []):
+        if nx.is_isomorphic(pattern, representatives[i]):
+            return i, False
+    buckets.setdefault(certificate, []).append(len(representatives))
+    representatives.append(pattern)
+    return len(representatives) - 1, True
+
+
+def isomorphism_classes(pattern_list, certificates=None):
+    '''Group the patterns into isomorphism classes, similar to np.unique.
+
+    Returns the indices of the first pattern of each class and an array that gives the
+    class of each pattern, such that pattern_list[unique[inverse[i]]] is isomorphic to
+    pattern_list[i]. Optionally, precomputed certificates can be given.'''
+    if certificates is None:
+        certificates = [None for _ in pattern_list]
+    buckets = dict()
+    representatives = list()
+    inverse = np.array([isomorphism_class(p, buckets, representatives, certificate=c)[0] 
+                        for p, c in zip(pattern_list, certificates)], dtype=np.int64)
+    # classes are numbered in the order of their first occurrence
+    _, unique = np.unique(inverse, return_index=True)
+    return unique, inverse
@@ -0,0 +1,69 @@
+import os
+import pickle
+import shutil
+import numpy as np
+
+
+class ResumableRun:
+    '''Named work directory that keeps the state of a homomorphism computation, such that
+    an interrupted run can be resumed and only computes the missing pairs.
+
+    The directory contains
+        - patterns.pkl: the sampled patterns and their tree decompositions
+        - counts.npy: memory mapped [ngraphs, npatterns] counts
+        - done.npy: memory mapped [ngraphs, npatterns] completion bitmap
+
+    counts and done are passed as out and done to count_patterns, which writes and marks
+    each count as soon as the backend returns it.'''
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.counts = None
+        self.done = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load_patterns(self):
+        '''Return the patterns and tree decompositions of an earlier run, or None'''
+        try:
+            with open(self._path('patterns.pkl'), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_patterns(self, pattern_list, td_list):
+        # write to a temporary file first, such that an interruption never leaves a partial file
+        with open(self._path('patterns.pkl.tmp'), 'wb') as f:
+            pickle.dump((pattern_list, td_list), f)
+        os.replace(self._path('patterns.pkl.tmp'), self._path('patterns.pkl'))
+
+    def open_counts(self, shape, dtype=np.int64):
+        '''Open the counts and the completion bitmap of an earlier run if they match shape
+        and dtype, and create new ones otherwise. Returns (counts, done).'''
+        shape = tuple(shape)
+        try:
+            counts = np.lib.format.open_memmap(self._path('counts.npy'), mode='r+')
+            done = np.lib.format.open_memmap(self._path('done.npy'), mode='r+')
+            if counts.shape != shape or counts.dtype != dtype or done.shape != shape:
+                raise ValueError(f'work directory {self.directory} contains counts of shape {counts.shape}')
+            print(f'NOTE resuming from {self.directory}, {np.sum(done)} of {done.size} pairs are done')
+        except (FileNotFoundError, ValueError):
+            counts = np.lib.format.open_memmap(self._path('counts.npy'), mode='w+', dtype=dtype, shape=shape)
+            done = np.lib.format.open_memmap(self._path('done.npy'), mode='w+', dtype=bool, shape=shape)
+            counts[:] = 0
+            done[:] = False
+        self.counts, self.done = counts, done
+        return counts, done
+
+    def flush(self):
+        if self.counts is not None:
+            self.counts.flush()
+            self.done.flush()
+
+    def remove(self):
+        '''Delete the work directory, e.g. once the final result is stored'''
+        self.counts = None
+        self.done = None
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -19,6 +19,20 @@ def filter_overflow(patterns, sizes):
         # if nothing worked, return zeros
         return np.zeros([patterns.shape[0], 1]), np.zeros(1)
 
+def log_hom_features(log_counts, pattern_sizes, graph_sizes, density=False, fill=-np.inf):
+    '''Turn natural logarithms of homomorphism counts into features.
+    
+    Returns log hom(F,G), or the log homomorphism density log t(F,G) = log hom(F,G) - |V(F)| log n 
+    if density is True. Zero counts, including the pairs that are skipped by the min_embedding, 
+    have no logarithm and are set to fill.'''
+    log_counts = np.asarray(log_counts, dtype=float)
+    features = log_counts
+    if density:
+        log_n = np.log(np.maximum(np.asarray(graph_sizes, dtype=float), 1.))
+        features = features - log_n[:, None] * np.asarray(pattern_sizes, dtype=float)[None, :]
+    return np.where(np.isneginf(log_counts), fill, features)
+
+
 def filter_singletons(patterns, sizes):
     larger = (sizes > 2)
     # first column contains the singleton counts that we want to keep
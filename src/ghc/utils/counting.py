@@ -0,0 +1,247 @@
+import numpy as np
+import networkx as nx
+import sys
+
+from ghc.utils.fast_hom import dataset_adjacency, is_tree_pattern, forest_hom_counts, forest_hom_counts_exact, \
+                              forest_log_hom_counts, cycle_length, graph_spectra, cycle_hom_counts, cycle_log_hom_counts
+from ghc.utils.modular import degree_log2_bounds, graph_degree_arrays
+from ghc.utils.canonical import isomorphism_classes
+from ghc.utils.homcache import graph_fingerprints
+from ghc.utils.HomSubio import required_pairs, result_array
+from ghc.utils.tree_decomposition import pattern_tree_decomposition
+from ghc.utils.invariants import graph_invariants, zero_pairs
+from ghc.utils.graph_store import graph_sizes
+
+
+def dataset_state(graph_list, state):
+    '''Return the per dataset data that is used by the fast paths. It is computed
+    on demand and kept in the dict state for as long as the same graph_list is passed.'''
+    if state.get('graph_list') is not graph_list:
+        state.clear()
+        state['graph_list'] = graph_list
+    return state
+
+
+def pattern_components(pattern):
+    '''Split a pattern into its connected components with at least two vertices (relabeled 
+    to 0..k-1) and the number of isolated vertices'''
+    components = [nx.convert_node_labels_to_integers(nx.Graph(pattern.subgraph(c).edges)) for c in nx.connected_components(pattern) if len(c) > 1]
+    return components, pattern.number_of_nodes() - sum(c.number_of_nodes() for c in components)
+
+
+def count_factorized(count_homs, pattern_list, graph_list, exact=False, log=False, done=None, **kwargs):
+    '''Count disconnected patterns as products of the counts of their components, as 
+    hom(F1 + F2, G) = hom(F1, G) hom(F2, G) and each isolated vertex contributes a factor 
+    |V(G)|. All components are counted in one call to count_patterns, hence isomorphic 
+    components (also of different patterns) are counted once. 
+    
+    Returns the [ngraphs, npatterns] counts. For int64 counts, products that overflow and 
+    products of failed counts (-1) are -1. If the [ngraphs, npatterns] completion bitmap 
+    done is given, components are only counted in graphs where a pair is not done, the
+    products in the other graphs are meaningless.'''
+    factors = [pattern_components(p) for p in pattern_list]
+    components = [c for cs, _ in factors for c in cs]
+    counts = np.zeros([len(graph_list), 0])
+    if len(components) > 0:
+        component_done = None if done is None else np.repeat(np.all(done, axis=1)[:, None], len(components), axis=1)
+        counts = count_patterns(count_homs, components, graph_list, [pattern_tree_decomposition(c) for c in components], 
+                                exact=exact, log=log, factorize=False, done=component_done, **kwargs)
+    sizes = graph_sizes(graph_list)[0].astype(object)
+
+    products = np.zeros([len(graph_list), len(pattern_list)], dtype=np.float64 if log else object)
+    first = 0
+    for jp, (cs, isolated) in enumerate(factors):
+        factor_counts = counts[:, first:first + len(cs)]
+        first += len(cs)
+        if log:
+            # isolated vertices contribute n^isolated, which is 1 (and not 0 * log 0) for isolated = 0
+            with np.errstate(divide='ignore'):
+                log_isolated = isolated * np.log(sizes.astype(np.float64)) if isolated > 0 else 0.
+            products[:, jp] = np.sum(factor_counts, axis=1) + log_isolated
+            continue
+        products[:, jp] = np.prod(factor_counts.astype(object), axis=1) * sizes ** isolated
+        if not exact:
+            # the product is unknown if a factor failed, unless another factor is zero
+            failed = np.any(factor_counts < 0, axis=1) & np.all(factor_counts != 0, axis=1)
+            overflow = np.array([c > np.iinfo(np.int64).max for c in products[:, jp]], dtype=bool)
+            products[failed | overflow, jp] = -1
+    return products if log or exact else products.astype(np.int64)
+
+
+def count_cached(count_homs, cache, pattern_list, graph_list, td_list, fingerprints, hom_counts, columns, min_embedding=False, kind='int64', 
+                 pair_mask=None, done=None, verbose=False, **kwargs):
+    '''Look up the counts of all pairs (where pair_mask is True) in the HomCache cache and 
+    pass only the missing pairs to count_homs (via pair_mask). Counts are written to 
+    hom_counts[:, columns] and new counts are added to the cache.'''
+    pattern_ids = [cache.pattern_id(p) for p in pattern_list]
+    cached, found = cache.lookup(pattern_ids, fingerprints, kind)
+    if pair_mask is not None:
+        found &= pair_mask
+
+    needed = required_pairs(pattern_list, graph_list, min_embedding=min_embedding, pair_mask=~found if pair_mask is None else ~found & pair_mask)
+
+    if np.any(needed):
+        count_homs(pattern_list=pattern_list, graph_list=graph_list, td_list=td_list, min_embedding=min_embedding, 
+                   verbose=verbose, pair_mask=needed, out=hom_counts, columns=columns, done=done, **kwargs)
+        new_counts = hom_counts[:, columns]
+        # failed HomSub calls return -1 and are not cached
+        cache.store(pattern_ids, fingerprints, new_counts, needed & (new_counts >= 0) if kind == 'int64' else needed, kind)
+
+    counts = hom_counts[:, columns]
+    counts[found] = cached[found]
+    hom_counts[:, columns] = counts
+    if done is not None:
+        done[:, columns] |= found
+
+    sys.stderr.write(f'hom cache: {np.sum(found)} of {found.size} pairs cached, {np.sum(needed)} pairs counted\n')
+
+
+def count_patterns(count_homs, pattern_list, graph_list, td_list, min_embedding=False, fast_paths=True, state=None, exact=False, log=False, dedup=True, cache=None, verbose=False, out=None, columns=None, done=None, factorize=True, prune=True, **kwargs):
+    '''Compute the [ngraphs, npatterns] matrix of homomorphism counts with the same
+    semantics as HomSub. Patterns of treewidth one are counted on all graphs at once
+    using sparse matrix-vector products over the block diagonal adjacency matrix of the
+    dataset. Cycles are counted from the spectra of the graphs, which are computed once. 
+    All remaining patterns are passed on to count_homs, which is one of the
+    backends selected by get_count_backend.
+
+    fast_paths: If False, all patterns are passed to count_homs.
+    state: dict that keeps dataset matrices between calls with the same graph_list.
+    exact: If True, the result is an object array of exact python ints. count_homs must 
+        then return exact counts, too.
+    log: If True, the result is a float64 array of the natural logarithms of the counts 
+        (-inf for zero counts). count_homs must then return logarithms, too.
+    dedup: If True, isomorphic patterns are counted only once and their column is copied.
+    cache: Optional HomCache. Counts of the patterns that are passed on to count_homs are 
+        looked up in the cache first and only missing pairs are counted.
+    out, columns: Optional result array (e.g. from open_result_array) and the columns of 
+        out that belong to the patterns, see result_array. out is returned.
+    done: Optional completion bitmap of the same shape as out. Pairs that are marked are 
+        not counted again, newly counted pairs are marked, see ResumableRun.
+    factorize: If True, disconnected patterns that are not forests are counted as products
+        of the counts of their components, see count_factorized.
+    prune: If True, pairs whose count is provably zero by cheap invariants of the pattern
+        and the graph (see zero_pairs) are not passed on to count_homs.'''
+
+    if state is None:
+        state = dict()
+
+    ngraphs = len(graph_list)
+    npatterns = len(pattern_list)
+    hom_counts, columns = result_array([ngraphs, npatterns], dtype=object if exact else np.float64 if log else np.int64,
+                                       fill=-np.inf if log else 0, out=out, columns=columns, done=done)
+
+    if dedup:
+        unique, inverse = isomorphism_classes(pattern_list)
+        if len(unique) < len(pattern_list):
+            sys.stderr.write(f'counting {len(unique)} distinct patterns, {len(pattern_list) - len(unique)} of {len(pattern_list)} patterns are isomorphic copies\n')
+            count_patterns(count_homs, [pattern_list[jp] for jp in unique], graph_list, [td_list[jp] for jp in unique],
+                           min_embedding=min_embedding, fast_paths=fast_paths, state=state, exact=exact, log=log,
+                           dedup=False, cache=cache, verbose=verbose, out=hom_counts, columns=columns[unique], done=done, 
+                           factorize=factorize, prune=prune, **kwargs)
+            hom_counts[:, columns] = hom_counts[:, columns[unique]][:, inverse]
+            if done is not None:
+                done[:, columns] = done[:, columns[unique]][:, inverse]
+            return hom_counts
+
+    # patterns whose counts are complete are skipped
+    remaining = [jp for jp in range(npatterns) if done is None or not np.all(done[:, columns[jp]])]
+    fast = list()
+    data = dataset_state(graph_list, state)
+    if fast_paths:
+
+        trees = {jp for jp in remaining if is_tree_pattern(pattern_list[jp])}
+        if len(trees) > 0:
+            if 'adjacency' not in data:
+                data['adjacency'], data['membership'] = dataset_adjacency(graph_list)
+            for jp in trees:
+                if log:
+                    hom_counts[:, columns[jp]] = forest_log_hom_counts(pattern_list[jp], data['adjacency'], data['membership'])
+                elif exact:
+                    if 'degrees' not in data:
+                        data['degrees'] = graph_degree_arrays(graph_list)
+                    log2_bound = np.max(degree_log2_bounds(pattern_list[jp], *data['degrees']), initial=0)
+                    hom_counts[:, columns[jp]] = forest_hom_counts_exact(pattern_list[jp], data['adjacency'], data['membership'], log2_bound)
+                else:
+                    hom_counts[:, columns[jp]] = forest_hom_counts(pattern_list[jp], data['adjacency'], data['membership'])
+            remaining = [jp for jp in remaining if jp not in trees]
+            fast += trees
+            if verbose:
+                sys.stderr.write(f'counted {len(trees)} tree patterns on the block diagonal adjacency\n')
+
+        cycles = {jp: cycle_length(pattern_list[jp]) for jp in remaining}
+        cycles = {jp: k for jp, k in cycles.items() if k is not None}
+        if len(cycles) > 0:
+            if 'spectra' not in data:
+                data['spectra'] = graph_spectra(graph_list)
+            for jp, k in cycles.items():
+                if log:
+                    hom_counts[:, columns[jp]] = cycle_log_hom_counts(k, graph_list, data['spectra'])
+                else:
+                    hom_counts[:, columns[jp]] = cycle_hom_counts(k, graph_list, data['spectra'], exact=exact)
+            remaining = [jp for jp in remaining if jp not in cycles]
+            fast += list(cycles)
+            if verbose:
+                sys.stderr.write(f'counted {len(cycles)} cycle patterns from the graph spectra\n')
+
+    factorized = list()
+    if factorize:
+        factorized = [jp for jp in remaining if not nx.is_connected(pattern_list[jp])]
+        if len(factorized) > 0:
+            factorized_done = None if done is None else done[:, columns[factorized]]
+            products = count_factorized(count_homs, [pattern_list[jp] for jp in factorized], graph_list, fast_paths=fast_paths, 
+                                        state=state, exact=exact, log=log, cache=cache, verbose=verbose, done=factorized_done, 
+                                        prune=prune, **kwargs)
+            if done is None:
+                hom_counts[:, columns[factorized]] = products
+            else:
+                counts = hom_counts[:, columns[factorized]]
+                counts[~factorized_done] = products[~factorized_done]
+                hom_counts[:, columns[factorized]] = counts
+            remaining = [jp for jp in remaining if jp not in factorized]
+            if verbose:
+                sys.stderr.write(f'counted {len(factorized)} disconnected patterns as products of their components\n')
+
+    zero = np.zeros([ngraphs, len(remaining)], dtype=bool)
+    if prune and len(remaining) > 0:
+        if 'invariants' not in data:
+            data['invariants'] = graph_invariants(graph_list)
+        zero = zero_pairs([pattern_list[jp] for jp in remaining], data['invariants'])
+        if np.any(zero):
+            sys.stderr.write(f'{np.sum(zero)} of {zero.size} pairs are zero by graph invariants and are not counted\n')
+
+    # the backends write their counts directly into hom_counts
+    pending = ~zero if done is None else ~zero & ~done[:, columns[remaining]]
+    if not np.any(pending):
+        pass
+    elif cache is not None:
+        if 'fingerprints' not in data:
+            data['fingerprints'] = graph_fingerprints(graph_list)
+        kind = 'log' if log else 'exact' if exact else 'int64'
+        count_cached(count_homs, cache, [pattern_list[jp] for jp in remaining], graph_list, [td_list[jp] for jp in remaining], 
+                     data['fingerprints'], hom_counts, columns[remaining], min_embedding=min_embedding, kind=kind, 
+                     pair_mask=pending, done=done, verbose=verbose, **kwargs)
+    else:
+        count_homs(pattern_list=[pattern_list[jp] for jp in remaining], graph_list=graph_list, td_list=[td_list[jp] for jp in remaining], 
+                   min_embedding=min_embedding, verbose=verbose, out=hom_counts, columns=columns[remaining], pair_mask=pending, 
+                   done=done, **kwargs)
+
+    if np.any(zero):
+        counts = hom_counts[:, columns[remaining]]
+        counts[zero] = -np.inf if log else 0
+        hom_counts[:, columns[remaining]] = counts
+
+    required = required_pairs(pattern_list, graph_list, min_embedding=min_embedding)
+    if min_embedding:
+        # for the min_embedding, counts of patterns larger than the graph are zero
+        counts = hom_counts[:, columns]
+        counts[~required] = -np.inf if log else 0
+        hom_counts[:, columns] = counts
+
+    if done is not None:
+        done[:, columns] |= ~required
+        done[:, columns[fast]] = True
+        done[:, columns[remaining]] |= zero
+        # products of failed component counts are counted again
+        done[:, columns[factorized]] |= np.ones([ngraphs, len(factorized)], dtype=bool) if exact or log else hom_counts[:, columns[factorized]] >= 0
+
+    return hom_counts
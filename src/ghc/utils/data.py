@@ -9,6 +9,9 @@ import json
 from itertools import repeat
 from sklearn.model_selection import KFold
 
+from ghc.utils.graph_store import GraphStore, graph_sizes
+from ghc.utils.invariants import graph_invariants
+
 
 def to_onehot(y, nmax=None):
     '''Convert a 1d numpy array to 2d one hot.'''
@@ -35,6 +38,16 @@ def precompute_patterns_file_handle(dataset, hom_type, hom_size, pattern_count,
     tmp_str = f"{dataf}/{dataset}_{hom_type}_{hom_size}_{pattern_count}_{run_id}.patterns"
     return open(tmp_str, 'wb')
 
+def precompute_counts_file(dataset, hom_type, hom_size, pattern_count, run_id, dloc):
+    '''Path of the memory mapped array that receives the counts while they are computed'''
+    dataf = os.path.abspath(dloc)
+    return f"{dataf}/{dataset}_{hom_type}_{hom_size}_{pattern_count}_{run_id}.counts.npy"
+
+def precompute_work_dir(dataset, hom_type, hom_size, pattern_count, run_id, dloc):
+    '''Path of the work directory that allows to resume an interrupted computation'''
+    dataf = os.path.abspath(dloc)
+    return f"{dataf}/{dataset}_{hom_type}_{hom_size}_{pattern_count}_{run_id}.work"
+
 
 def load_data_for_json(fname, dloc):
     graphs, feats, y = load_data(fname, dloc)
@@ -77,23 +90,39 @@ def load_precompute_patterns(dataset, hom_type, hom_size, pattern_count, run_id,
     return X
 
 def load_data(dname, dloc):
-    """Load datasets"""
+    """Load datasets. If the graphs were converted with save_graph_store, they are 
+    returned as a memory mapped GraphStore instead of a list of networkx graphs."""
     X = None
     y = None
     graphs = None
     name = os.path.abspath(os.path.join(dloc, dname))
-    with open(name+".graph", "rb") as f:
-        graphs = pkl.load(f)
+    if os.path.exists(name+".graphs.npz"):
+        graphs = GraphStore.load(name+".graphs.npz")
+    else:
+        with open(name+".graph", "rb") as f:
+            graphs = pkl.load(f)
     with open(name+".y", "rb") as f:
         y = pkl.load(f)
     if os.path.exists(name+".X"):
         with open(name+".X", "rb") as f:
             X = pkl.load(f)
     else:
-        X = [np.ones(g.number_of_nodes()).reshape([-1,1]) for g in graphs]
+        X = [np.ones(n).reshape([-1,1]) for n in graph_sizes(graphs)[0]]
     return graphs, X, y
 
 
+def save_graph_store(dname, dloc):
+    """Convert the pickled graphs of a dataset to the compact arrays of a GraphStore, 
+    which load_data prefers from then on. Vertex and edge labels are not kept. The invariants
+    that certify zero homomorphism counts (see graph_invariants) are saved with the graphs."""
+    name = os.path.abspath(os.path.join(dloc, dname))
+    with open(name+".graph", "rb") as f:
+        graphs = pkl.load(f)
+    store = GraphStore.from_graphs(graphs)
+    store.invariants = graph_invariants(graphs)
+    store.save(name+".graphs.npz")
+
+
 def load_folds(dname, dloc):
     """Load preassigned 10-folds splits for each datasets"""
     splits = None
@@ -0,0 +1,179 @@
+import math
+import numpy as np
+import networkx as nx
+import scipy.sparse as sparse
+
+from ghc.utils.modular import crt_primes, primes_for_bound, crt_reconstruct
+from ghc.utils.graph_store import graph_arrays, graph_edges, graph_sizes
+
+
+def dataset_adjacency(graph_list):
+    '''Sparse int64 block diagonal adjacency matrix of all graphs in the dataset
+    (as in homsub_format_wl_nodelabels), together with a sparse [ngraphs, nvertices]
+    matrix that indicates which vertex belongs to which graph.'''
+
+    sizes, edge_offsets, edges = graph_arrays(graph_list)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    # shift the vertices of each graph by the number of vertices of the graphs before it
+    edges = np.asarray(edges, dtype=np.int64) + np.repeat(offsets[:-1], np.diff(edge_offsets))[:, None]
+    loops = edges[:, 0] == edges[:, 1]
+    rows = np.concatenate([edges[:, 0], edges[~loops, 1]])
+    cols = np.concatenate([edges[:, 1], edges[~loops, 0]])
+
+    nvertices = offsets[-1]
+    adj = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(nvertices, nvertices))
+    membership = sparse.csr_matrix((np.ones(nvertices, dtype=np.int64),
+                                    (np.repeat(np.arange(len(graph_list)), sizes), np.arange(nvertices))),
+                                   shape=(len(graph_list), nvertices))
+    return adj, membership
+
+
+def is_tree_pattern(pattern):
+    '''Patterns of treewidth at most one, i.e., forests, are handled by forest_hom_counts'''
+    return pattern.number_of_nodes() > 0 and nx.is_forest(pattern)
+
+
+def rooted_tree_homs(tree, root, adj, modulus=None):
+    '''Vector of homomorphism counts of the tree rooted at root, where the root is
+    mapped to each vertex of the graph given by adj.
+
+    Processes the tree bottom up: a vertex is mapped to x in as many ways as the product
+    over its children c of the number of ways to map the subtree of c to some neighbor of x.
+
+    If modulus is given, counts are computed modulo modulus (which must be below 2^31).
+    Sums of neighbor counts are reduced before they are multiplied, such that all 
+    products are products of two residues and fit into int64.'''
+
+    ones = np.ones(adj.shape[0], dtype=np.int64)
+    homs = dict()
+    # in reversed dfs order, each subtree is complete before it is attached to its parent
+    for parent, v in reversed(list(nx.dfs_edges(tree, root))):
+        neighbors = adj @ homs.get(v, ones)
+        if modulus is not None:
+            neighbors %= modulus
+        homs[parent] = homs.get(parent, ones) * neighbors
+        if modulus is not None:
+            homs[parent] %= modulus
+    return homs.get(root, ones)
+
+
+def forest_hom_counts(pattern, adj, membership, modulus=None):
+    '''Homomorphism counts of a forest into each graph of the dataset given by
+    dataset_adjacency. As homomorphism counts are multiplicative over connected
+    components of the pattern, the counts of the trees are multiplied.
+
+    Counts are int64 and may overflow, just as the counts of HomSub. If modulus is 
+    given, counts are computed modulo modulus (which must be below 2^31).'''
+
+    counts = np.ones(membership.shape[0], dtype=np.int64)
+    for component in nx.connected_components(pattern):
+        tree = pattern.subgraph(component)
+        root = next(iter(component))
+        tree_counts = membership @ rooted_tree_homs(tree, root, adj, modulus=modulus)
+        if modulus is not None:
+            tree_counts %= modulus
+        counts *= tree_counts
+        if modulus is not None:
+            counts %= modulus
+    return counts
+
+
+def sparse_logsumexp_matvec(matrix, log_vector):
+    '''Compute log(matrix @ exp(log_vector)) for a sparse csr matrix with 0/1 entries, 
+    stabilized by the maximum of each row. log(0) is -inf.'''
+    nrows = matrix.shape[0]
+    rows = np.repeat(np.arange(nrows), np.diff(matrix.indptr))
+    values = log_vector[matrix.indices]
+    rowmax = np.full(nrows, -np.inf)
+    np.maximum.at(rowmax, rows, values)
+    shift = np.where(np.isfinite(rowmax), rowmax, 0.)
+    sums = np.bincount(rows, weights=np.exp(values - shift[rows]), minlength=nrows)
+    with np.errstate(divide='ignore'):
+        return np.log(sums) + shift
+
+
+def forest_log_hom_counts(pattern, adj, membership):
+    '''Natural logarithms of the homomorphism counts of a forest into each graph 
+    of the dataset, computed in log space such that nothing overflows.'''
+    zeros = np.zeros(adj.shape[0])
+    counts = np.zeros(membership.shape[0])
+    for component in nx.connected_components(pattern):
+        tree = pattern.subgraph(component)
+        root = next(iter(component))
+        homs = dict()
+        for parent, v in reversed(list(nx.dfs_edges(tree, root))):
+            homs[parent] = homs.get(parent, zeros) + sparse_logsumexp_matvec(adj, homs.get(v, zeros))
+        counts += sparse_logsumexp_matvec(membership, homs.get(root, zeros))
+    return counts
+
+
+def forest_hom_counts_exact(pattern, adj, membership, log2_bound):
+    '''Exact homomorphism counts of a forest as object array of python ints, computed 
+    modulo several primes and reconstructed with the chinese remainder theorem.'''
+    primes = crt_primes(primes_for_bound(log2_bound))
+    residues = [forest_hom_counts(pattern, adj, membership, modulus=p) for p in primes]
+    return crt_reconstruct(residues, primes)
+
+
+def cycle_length(pattern):
+    '''Return k if the pattern is a cycle C_k (k >= 3) and None otherwise'''
+    n = pattern.number_of_nodes()
+    if n < 3 or pattern.number_of_edges() != n or nx.number_of_selfloops(pattern) > 0:
+        return None
+    if any(d != 2 for _, d in pattern.degree) or not nx.is_connected(pattern):
+        return None
+    return n
+
+
+def dense_adjacency(graph_list, ig, dtype=np.float64):
+    '''Adjacency matrix of graph ig of a GraphStore or a list of networkx graphs, with 
+    vertices in the order of g.nodes as nx.to_numpy_array'''
+    n, edges = graph_edges(graph_list, ig)
+    adj = np.zeros([n, n], dtype=dtype)
+    adj[edges[:, 0], edges[:, 1]] = 1
+    adj[edges[:, 1], edges[:, 0]] = 1
+    return adj
+
+
+def graph_spectra(graph_list):
+    '''Eigenvalues of the adjacency matrices of all graphs, padded with zeros 
+    to a [ngraphs, max number of vertices] array. Padding does not change any 
+    power sum of the eigenvalues.'''
+    node_counts, _ = graph_sizes(graph_list)
+    spectra = np.zeros([len(node_counts), np.max(node_counts, initial=1)])
+    for i, n in enumerate(node_counts):
+        if n > 0:
+            spectra[i, :n] = np.linalg.eigvalsh(dense_adjacency(graph_list, i))
+    return spectra
+
+
+def cycle_hom_counts(k, graph_list, spectra, spectral_limit=2**40, exact=False):
+    '''Homomorphism counts of the cycle C_k into all graphs. 
+    
+    hom(C_k, G) is the number of closed walks of length k in G, i.e., trace(A^k), 
+    which is the sum of the k-th powers of the eigenvalues of A. If this sum is too large
+    to be exactly recovered from floating point eigenvalues (estimated by the sum of the 
+    absolute values of the powers exceeding spectral_limit), trace(A^k) is computed by 
+    integer matrix powers instead. 
+
+    Counts are int64 and may overflow, just as the counts of HomSub. If exact is True, 
+    the matrix powers use python ints and the result is an object array.'''
+
+    powers = spectra ** k
+    spectral = np.sum(np.abs(powers), axis=1) <= spectral_limit
+    counts = np.zeros(len(graph_list), dtype=object if exact else np.int64)
+    counts[spectral] = np.rint(np.sum(powers[spectral], axis=1)).astype(np.int64)
+    for i in np.nonzero(~spectral)[0]:
+        adj = dense_adjacency(graph_list, i, dtype=np.int64)
+        if exact:
+            adj = adj.astype(object)
+        counts[i] = np.trace(np.linalg.matrix_power(adj, k))
+    return counts
+
+
+def cycle_log_hom_counts(k, graph_list, spectra, spectral_limit=2**40):
+    '''Natural logarithms of the homomorphism counts of the cycle C_k into all graphs, 
+    computed from the exact counts of cycle_hom_counts.'''
+    counts = cycle_hom_counts(k, graph_list, spectra, spectral_limit=spectral_limit, exact=True)
+    return np.array([math.log(c) if c > 0 else -np.inf for c in counts])
@@ -6,6 +6,9 @@ import scipy.sparse as sparse
 import numpy as np
 import networkx as nx
 from ghc.utils.data import from_onehot, to_onehot
+from ghc.utils.fast_hom import dataset_adjacency
+from ghc.utils.graph_store import graph_sizes
+from ghc.utils.canonical import isomorphism_classes
 
 import os, inspect
 
@@ -31,7 +34,7 @@ def compress_int(labels: np.array):
 
 def homsub_format_wl_nodelabels(graphs, vertex_features, n_iter):
     
-    adj = sparse.block_diag([nx.to_scipy_sparse_matrix(g) for g in graphs], format='csr')
+    adj, _ = dataset_adjacency(graphs)
     
     if vertex_features is not None:
         v = np.vstack(vertex_features)
@@ -45,8 +48,7 @@ def homsub_format_wl_nodelabels(graphs, vertex_features, n_iter):
 
     wl_features = list()
     i = 0
-    for g in graphs:
-        n = g.number_of_nodes()
+    for n in graph_sizes(graphs)[0]:
         wl_features.append(oh[i:i+n, :])
         i += n
 
@@ -70,6 +72,32 @@ def wl_direct_scipysparse(a: sparse.csr_matrix, vertex_labels=None,  n_iter=5):
     return newlbl
 
 
+def graph_isomorphism_classes(graphs, n_iter=3):
+    '''Group the graphs into isomorphism classes, ignoring vertex and edge labels. 
+    Returns (unique, inverse) as ghc.utils.canonical.isomorphism_classes.
+
+    Graphs are bucketed by their size and the multiset of their WL labels after n_iter 
+    iterations, which are computed for all graphs at once on the block diagonal adjacency 
+    matrix. Only graphs within a bucket of several graphs are tested for isomorphism, hence 
+    the graphs of a GraphStore are only materialized if they share their bucket.'''
+    adj, _ = dataset_adjacency(graphs)
+    labels = compress_int(wl_direct_scipysparse(adj, n_iter=n_iter))
+
+    buckets = dict()
+    i = 0
+    for ig, (n, m) in enumerate(zip(*graph_sizes(graphs))):
+        buckets.setdefault((int(n), int(m), tuple(np.sort(labels[i:i+n]))), []).append(ig)
+        i += n
+
+    # each graph is mapped to the first graph of its class
+    first = np.arange(len(graphs))
+    for members in buckets.values():
+        if len(members) > 1:
+            unique, inverse = isomorphism_classes([graphs[ig] for ig in members])
+            first[members] = np.array(members)[unique[inverse]]
+    return np.unique(first, return_inverse=True)
+
+
 def compare_equivalence_classes(hom_features, wl_features):
     '''returns the difference between number of unique rows in first argument and 
     number of unique rows in second argument.
@@ -0,0 +1,138 @@
+import operator
+import weakref
+import zipfile
+import numpy as np
+import networkx as nx
+
+
+def _npz_memmap(path, name):
+    '''Memory map the array name of an uncompressed .npz file (as written by np.savez)'''
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + '.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f'{name} is compressed in {path} and cannot be memory mapped')
+    with open(path, 'rb') as f:
+        # the data follows the local file header, whose extra field may differ from the central directory
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+        f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if np.prod(shape) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+class GraphStore:
+    '''Read-only sequence of graphs in compact arrays, as a replacement of lists of
+    networkx graphs for large datasets.
+
+    Graph i has node_counts[i] vertices 0..node_counts[i]-1 and the edges
+    edges[edge_offsets[i]:edge_offsets[i+1]] (an [m, 2] array). Indexing and iterating
+    materializes networkx graphs on demand. Materialized graphs are reused as long as they
+    are referenced elsewhere, such that repeated access gives the same object.
+
+    Code that only needs the arrays should use graph_arrays and graph_edges, which work for
+    GraphStores and lists of networkx graphs alike.
+
+    invariants is an optional dict of per graph arrays (see graph_invariants) that is saved 
+    and loaded with the graphs, such that it is computed only once per dataset.'''
+
+    def __init__(self, node_counts, edge_offsets, edges, invariants=None):
+        self.node_counts = node_counts
+        self.edge_offsets = edge_offsets
+        self.edges = edges
+        self.invariants = invariants
+        self._graphs = weakref.WeakValueDictionary()
+
+    @classmethod
+    def from_graphs(cls, graphs):
+        node_counts, edge_offsets, edges = graph_arrays(graphs)
+        return cls(node_counts, edge_offsets, edges.astype(np.int32))
+
+    def save(self, path):
+        '''Write the arrays to an uncompressed .npz file, which load can memory map'''
+        invariants = {'invariant_' + key: value for key, value in (self.invariants or dict()).items()}
+        np.savez(path, node_counts=self.node_counts, edge_offsets=self.edge_offsets, edges=self.edges, **invariants)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with zipfile.ZipFile(path) as archive:
+            names = [name[:-len('.npy')] for name in archive.namelist()]
+        if mmap:
+            arrays = {name: _npz_memmap(path, name) for name in names}
+        else:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in names}
+        invariants = {name[len('invariant_'):]: array for name, array in arrays.items() if name.startswith('invariant_')}
+        return cls(arrays['node_counts'], arrays['edge_offsets'], arrays['edges'], invariants=invariants or None)
+
+    def __len__(self):
+        return len(self.node_counts)
+
+    def __getitem__(self, i):
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f'graph index {i} out of range')
+        g = self._graphs.get(i)
+        if g is None:
+            g = nx.empty_graph(int(self.node_counts[i]))
+            g.add_edges_from(self.edges[self.edge_offsets[i]:self.edge_offsets[i + 1]].tolist())
+            self._graphs[i] = g
+        return g
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def subset(self, indices):
+        '''GraphStore of the graphs with the given indices, e.g., the representatives of
+        isomorphism classes. The arrays are copied, hence the result is not memory mapped.'''
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = np.asarray(self.edge_offsets)[indices]
+        lengths = np.asarray(self.edge_offsets)[indices + 1] - starts
+        edge_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        edge_index = np.repeat(starts - edge_offsets[:-1], lengths) + np.arange(edge_offsets[-1])
+        invariants = None
+        if self.invariants is not None:
+            invariants = {key: np.asarray(value)[indices] for key, value in self.invariants.items()}
+        return GraphStore(np.asarray(self.node_counts)[indices], edge_offsets, np.asarray(self.edges)[edge_index], invariants=invariants)
+
+
+def graph_arrays(graph_list):
+    '''Return (node_counts, edge_offsets, edges) as in GraphStore of a GraphStore or a list
+    of networkx graphs. Vertices of networkx graphs are numbered in the order of g.nodes.'''
+    if isinstance(graph_list, GraphStore):
+        return graph_list.node_counts, graph_list.edge_offsets, graph_list.edges
+    node_counts = np.array([g.number_of_nodes() for g in graph_list], dtype=np.int64)
+    edge_lists = list()
+    for g in graph_list:
+        index = {v: i for i, v in enumerate(g.nodes)}
+        edge_lists.append(np.array([(index[u], index[v]) for u, v in g.edges], dtype=np.int64).reshape(-1, 2))
+    edge_offsets = np.concatenate([[0], np.cumsum([len(e) for e in edge_lists], dtype=np.int64)]).astype(np.int64)
+    edges = np.concatenate(edge_lists) if len(edge_lists) > 0 else np.zeros([0, 2], dtype=np.int64)
+    return node_counts, edge_offsets, edges
+
+
+def graph_edges(graph_list, ig):
+    '''Number of vertices and [m, 2] edge array of graph ig of a GraphStore or a list of
+    networkx graphs'''
+    if isinstance(graph_list, GraphStore):
+        return int(graph_list.node_counts[ig]), np.asarray(graph_list.edges[graph_list.edge_offsets[ig]:graph_list.edge_offsets[ig + 1]])
+    g = graph_list[ig]
+    index = {v: i for i, v in enumerate(g.nodes)}
+    return len(index), np.array([(index[u], index[v]) for u, v in g.edges], dtype=np.int64).reshape(-1, 2)
+
+
+def graph_sizes(graph_list):
+    '''Arrays of the numbers of vertices and edges of the graphs'''
+    if isinstance(graph_list, GraphStore):
+        return np.asarray(graph_list.node_counts, dtype=np.int64), np.diff(graph_list.edge_offsets).astype(np.int64)
+    return (np.array([g.number_of_nodes() for g in graph_list], dtype=np.int64),
+            np.array([g.number_of_edges() for g in graph_list], dtype=np.int64))
@@ -0,0 +1,438 @@
+import numpy as np
+import networkx as nx
+from scipy.special import logsumexp
+from tqdm import tqdm
+from ghc.utils.HomSubio import read_PACE_graphs, required_pairs, result_array, pair_costs
+from ghc.utils.modular import crt_primes, primes_for_bound, crt_reconstruct, degree_log2_bounds
+from ghc.utils.graph_store import graph_edges, graph_sizes
+
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_PACE_td(td_string):
+    '''Parse a tree decomposition given in PACE format, as created by
+    random_ktree_decomposition.
+
+    Returns the bags as a list of lists of (0-based) pattern vertices and
+    the edges of the decomposition tree as a list of (0-based) bag index pairs.'''
+
+    bags = None
+    td_edges = list()
+    for line in td_string.splitlines():
+        tokens = line.split()
+        if len(tokens) == 0 or tokens[0] == 'c':
+            continue
+        if tokens[0] == 's':
+            bags = [list() for _ in range(int(tokens[2]))]
+        elif tokens[0] == 'b':
+            bags[int(tokens[1]) - 1] = [int(v) - 1 for v in tokens[2:]]
+        else:
+            td_edges.append((int(tokens[0]) - 1, int(tokens[1]) - 1))
+
+    if bags is None:
+        raise ValueError('tree decomposition has no solution line')
+    return bags, td_edges
+
+
+def td_schedule(pattern, bags, td_edges):
+    '''Root the tree decomposition at the first bag and prepare the dynamic program.
+
+    Returns a list of bags in post order. Each entry is a tuple
+    (bag vertices, vertices shared with the parent, assigned pattern edges, children)
+    where children are positions in the returned list.'''
+
+    neighbors = [list() for _ in bags]
+    for i, j in td_edges:
+        neighbors[i].append(j)
+        neighbors[j].append(i)
+
+    # iterative dfs to find parents and a post order of the bags
+    parent = [-1 for _ in bags]
+    preorder = list()
+    visited = [False for _ in bags]
+    stack = [0]
+    visited[0] = True
+    while len(stack) > 0:
+        b = stack.pop()
+        preorder.append(b)
+        for c in neighbors[b]:
+            if not visited[c]:
+                visited[c] = True
+                parent[c] = b
+                stack.append(c)
+    postorder = preorder[::-1]
+    position = {b: i for i, b in enumerate(postorder)}
+
+    # assign each pattern edge to exactly one bag that contains both endpoints
+    bag_sets = [set(bag) for bag in bags]
+    assigned = [list() for _ in bags]
+    for u, v in pattern.edges:
+        for b in postorder:
+            if u in bag_sets[b] and v in bag_sets[b]:
+                assigned[b].append((u, v))
+                break
+        else:
+            raise ValueError(f'tree decomposition does not cover pattern edge ({u}, {v})')
+
+    schedule = list()
+    for b in postorder:
+        if parent[b] == -1:
+            shared = list()
+        else:
+            shared = sorted(bag_sets[b] & bag_sets[parent[b]])
+        children = [position[c] for c in neighbors[b] if parent[c] == b]
+        schedule.append((sorted(bags[b]), shared, assigned[b], children))
+    return schedule
+
+
+def _contract_broadcast(operands, nlabels, out_labels, multiply, eliminate):
+    '''Multiply the operands (given as alternating tensors and label lists, as for einsum) 
+    and sum out all labels that are not in out_labels, using the given multiply and 
+    eliminate (sum along an axis) operations. 
+    
+    Each product of two operands and each sum along a single axis is computed separately, 
+    which allows to reduce intermediate results, e.g., modulo a prime.'''
+    full = None
+    for tensor, labels in zip(operands[0::2], operands[1::2]):
+        labels = labels[1:]
+        keep = sorted(set(labels))
+        # permute the axes (and take diagonals of repeated labels) to sorted label order
+        t = np.einsum(tensor, [Ellipsis] + labels, [Ellipsis] + keep)
+        # and insert singleton axes for all labels that do not occur in the operand
+        batch = t.shape[:t.ndim - len(keep)]
+        t = t.reshape(batch + tuple(t.shape[len(batch) + keep.index(l)] if l in keep else 1 for l in range(nlabels)))
+        full = t if full is None else multiply(full, t)
+    # sum out labels from the last to the first, such that label l remains at axis l of the labels
+    nremaining = nlabels
+    for l in reversed(range(nlabels)):
+        if l not in out_labels:
+            full = eliminate(full, l - nremaining)
+            nremaining -= 1
+    return full
+
+
+def hom_count_td(schedule, adj, present, modulus=None, log=False):
+    '''Count homomorphisms from the pattern described by schedule into a graph.
+
+    adj is a (dense) adjacency tensor of shape [..., n, n] and present is a tensor
+    of shape [..., n] that is one for each vertex of the graph. Leading dimensions are
+    treated as batch dimensions. Each bag is processed as a single tensor contraction
+    that multiplies the adjacency tensors of the pattern edges assigned to the bag with the
+    messages of its children and sums out all vertices that are forgotten.
+
+    If modulus is given, the count is computed modulo modulus (which must be below 2^31).
+    If log is True, adj and present must be given as their logarithms and the dynamic 
+    program runs in log space, i.e., it returns the logarithm of the count and never overflows.'''
+
+    if log:
+        ones = np.zeros_like(present)
+        multiply, eliminate = np.add, logsumexp
+    else:
+        ones = np.ones_like(present)
+        if modulus is not None:
+            multiply = lambda a, b: (a * b) % modulus
+            eliminate = lambda t, axis: np.sum(t, axis=axis) % modulus
+
+    messages = list()
+    for bag, shared, edges, children in schedule:
+        label = {v: i for i, v in enumerate(bag)}
+        shared_set = set(shared)
+
+        operands = list()
+        covered = set()
+        for u, v in edges:
+            operands += [adj, [Ellipsis, label[u], label[v]]]
+            covered.update((u, v))
+        for c in children:
+            c_shared = schedule[c][1]
+            operands += [messages[c], [Ellipsis] + [label[v] for v in c_shared]]
+            covered.update(c_shared)
+        for v in bag:
+            if v not in shared_set:
+                # vertex is forgotten in this bag and contributes its image vertices
+                operands += [present, [Ellipsis, label[v]]]
+            elif v not in covered:
+                operands += [ones, [Ellipsis, label[v]]]
+
+        out_labels = [label[v] for v in shared]
+        if modulus is None and not log:
+            messages.append(np.einsum(*operands, [Ellipsis] + out_labels, optimize='greedy'))
+        else:
+            messages.append(_contract_broadcast(operands, len(bag), out_labels, multiply, eliminate))
+
+    return messages[-1]
+
+
+def hom_count_td_exact(schedule, adj, present, log2_bound):
+    '''Exact homomorphism count as python int, computed modulo several primes and 
+    reconstructed with the chinese remainder theorem. log2_bound is an upper bound on 
+    the binary logarithm of the count.'''
+    primes = crt_primes(primes_for_bound(log2_bound))
+    residues = [hom_count_td(schedule, adj, present, modulus=p) for p in primes]
+    return crt_reconstruct(residues, primes)
+
+
+def adjacency_tensor(g):
+    '''Dense int64 adjacency matrix of a networkx graph'''
+    return nx.to_numpy_array(g, dtype=np.int64)
+
+
+def log_tensor(t):
+    '''Elementwise natural logarithm with log(0) = -inf'''
+    with np.errstate(divide='ignore'):
+        return np.log(t)
+
+
+def adjacency_from_edges(n, edges):
+    '''Dense int64 adjacency matrix of a graph on n vertices given by a list of 0-based edges'''
+    adj = np.zeros([n, n], dtype=np.int64)
+    if len(edges) > 0:
+        e = np.array(edges)
+        adj[e[:, 0], e[:, 1]] = 1
+        adj[e[:, 1], e[:, 0]] = 1
+    return adj
+
+
+def batch_tensors(graph_list, graph_ids):
+    '''Adjacency tensor of shape [len(graph_ids), n, n] of the graphs, padded with isolated 
+    vertices to the largest number of vertices n, and the [len(graph_ids), n] tensor that 
+    is one for the vertices of each graph and zero for the padding.'''
+    sizes = graph_sizes(graph_list)[0]
+    n = max([sizes[ig] for ig in graph_ids])
+    adj = np.zeros([len(graph_ids), n, n], dtype=np.int64)
+    present = np.zeros([len(graph_ids), n], dtype=np.int64)
+    for b, ig in enumerate(graph_ids):
+        k, edges = graph_edges(graph_list, ig)
+        adj[b, :k, :k] = adjacency_from_edges(k, edges)
+        present[b, :k] = 1
+    return adj, present
+
+
+def graph_batches(graph_ids, graph_sizes, bag_size, max_batch_elements):
+    '''Split the graphs into batches of graphs of similar size, such that the padded tensors 
+    of a bag of the given size have at most max_batch_elements entries per batch, i.e., 
+    len(batch) * n^bag_size <= max_batch_elements, where n is the largest graph in the batch. 
+    Padding increases the tensors of each graph in a batch at most by a factor of two.
+    Graphs that exceed the limit on their own are single batches.'''
+    graph_ids = sorted(graph_ids, key=lambda ig: -graph_sizes[ig])
+    batches = list()
+    for ig in graph_ids:
+        if len(batches) > 0:
+            padded = max(graph_sizes[batches[-1][0]], 1) ** bag_size
+            fits = (len(batches[-1]) + 1) * padded <= max_batch_elements
+        if len(batches) > 0 and fits and padded <= 2 * max(graph_sizes[ig], 1) ** bag_size:
+            batches[-1].append(ig)
+        else:
+            batches.append([ig])
+    return batches
+
+
+def HomDP(pattern_list, graph_list, td_list, verbose=False, min_embedding=False, n_jobs=1, exact=False, log=False, pair_mask=None, out=None, columns=None, done=None, order_by_cost=True,
+          batch_graphs=False, max_batch_elements=2**20):
+    '''Compute homomorphism counts for a batch of patterns and a batch of
+    (transaction) graphs in process. Drop-in replacement for HomSub that runs the
+    dynamic program over the given tree decompositions using dense numpy tensor
+    contractions.
+
+    Counts are computed in int64 and hence may overflow, just as the counts of HomSub.
+
+    min_embedding: If True, for each (transaction) graph, we use only those patterns that
+        have smaller or equal size. This implements the min-kernel as
+        descibed in the paper.
+
+    n_jobs: Number of threads that process graphs concurrently. 
+
+    exact: If True, counts are computed modulo several primes below 2^31 and reconstructed 
+        exactly. The result is then an object array of python ints that never overflows. 
+
+    log: If True, the dynamic program runs in log space and the result is a float64 array 
+        of the natural logarithms of the counts (-inf for zero counts). 
+
+    pair_mask: Optional boolean array of shape [ngraphs, npatterns]. Only pairs for which it
+        is True are counted, all other counts remain zero (-inf if log is True). 
+
+    out, columns, done: Optional preallocated result array and completion bitmap, see 
+        result_array. Counts are written to out and marked in done as soon as they are 
+        computed. 
+
+    order_by_cost: If True, graphs are processed in order of decreasing estimated cost 
+        (see pair_costs), such that the threads finish at about the same time. 
+
+    batch_graphs: If True, each pattern is counted in batches of graphs of similar size at 
+        once, using the batch dimension of hom_count_td on padded adjacency tensors (padding 
+        vertices are not present and never contribute). This replaces many small contractions 
+        by few large ones, which pays off for int64 counts in datasets of many small graphs. 
+        Batches are limited to about max_batch_elements entries per bag tensor, see graph_batches.'''
+
+    if exact and log:
+        raise ValueError('exact and log counting are mutually exclusive')
+
+    schedules = [td_schedule(p, *parse_PACE_td(td)) for p, td in zip(pattern_list, td_list)]
+
+    ngraphs = len(graph_list)
+    npatterns = len(pattern_list)
+    required = required_pairs(pattern_list, graph_list, min_embedding=min_embedding, pair_mask=pair_mask)
+    hom_counts, columns = result_array([ngraphs, npatterns], dtype=object if exact else np.float64 if log else np.int64,
+                                       fill=-np.inf if log else 0, out=out, columns=columns, done=done)
+
+    def count(ig):
+        adj = adjacency_from_edges(*graph_edges(graph_list, ig))
+        present = np.ones(adj.shape[0], dtype=np.int64)
+        max_degree = np.max(np.sum(adj, axis=1), initial=0)
+        if log:
+            adj, present = log_tensor(adj), log_tensor(present)
+        for jp in np.nonzero(required[ig])[0]:
+            if verbose:
+                sys.stderr.write(f'pattern_{jp} n={len(pattern_list[jp].nodes)} m={len(pattern_list[jp].edges)}, graph_{ig} n={adj.shape[0]} m={np.sum(np.triu(adj))}' + '\n')
+            if exact:
+                log2_bound = degree_log2_bounds(pattern_list[jp], [adj.shape[0]], [max_degree])[0]
+                hom_counts[ig, columns[jp]] = hom_count_td_exact(schedules[jp], adj, present, log2_bound)
+            else:
+                hom_counts[ig, columns[jp]] = hom_count_td(schedules[jp], adj, present, log=log)
+            if done is not None:
+                done[ig, columns[jp]] = True
+
+    if order_by_cost:
+        costs = np.where(required, pair_costs(pattern_list, graph_list, td_list), 0)
+        graph_order = np.argsort(-np.sum(costs, axis=1), kind='stable')
+    else:
+        graph_order = range(ngraphs)
+
+    def count_batch(job):
+        jp, batch = job
+        adj, present = batch_tensors(graph_list, batch)
+        if verbose:
+            sys.stderr.write(f'pattern_{jp} n={len(pattern_list[jp].nodes)} m={len(pattern_list[jp].edges)}, batch of {len(batch)} graphs with n<={adj.shape[1]}' + '\n')
+        if log:
+            counts = hom_count_td(schedules[jp], log_tensor(adj), log_tensor(present), log=True)
+        elif exact:
+            sizes = graph_sizes(graph_list)[0][batch]
+            log2_bound = np.max(degree_log2_bounds(pattern_list[jp], sizes, np.max(np.sum(adj, axis=2), axis=1, initial=0)))
+            primes = crt_primes(primes_for_bound(log2_bound))
+            counts = crt_reconstruct([hom_count_td(schedules[jp], adj, present, modulus=p) for p in primes], primes)
+        else:
+            counts = hom_count_td(schedules[jp], adj, present)
+        for b, ig in enumerate(batch):
+            hom_counts[ig, columns[jp]] = counts[b]
+        if done is not None:
+            done[batch, columns[jp]] = True
+
+    if batch_graphs:
+        sizes = graph_sizes(graph_list)[0]
+        jobs = [(jp, batch) for jp in range(npatterns) 
+                for batch in graph_batches(np.nonzero(required[:, jp])[0], sizes, max(len(bag) for bag, _, _, _ in schedules[jp]), max_batch_elements)]
+        if order_by_cost:
+            costs = pair_costs(pattern_list, graph_list, td_list)
+            jobs = sorted(jobs, key=lambda job: -np.sum(costs[job[1], job[0]]))
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            for _ in tqdm(pool.map(count_batch, jobs), total=len(jobs)):
+                pass
+        return hom_counts
+
+    # numpy releases the GIL during the contractions
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for _ in tqdm(pool.map(count, graph_order), total=ngraphs):
+            pass
+
+    return hom_counts
+
+
+def _tokens(lines):
+    '''Return the tokens of the next line that is neither empty nor a comment'''
+    for line in lines:
+        tokens = line.split()
+        if len(tokens) > 0 and tokens[0] != 'c':
+            return tokens
+    return None
+
+
+def _read_graph_block(lines):
+    '''Read a single PACE graph from an iterator over lines'''
+    n, m = [int(x) for x in _tokens(lines)[2:4]]
+    edges = [tuple(int(x) - 1 for x in _tokens(lines)[:2]) for _ in range(m)]
+    return n, edges
+
+
+def _read_td_block(lines):
+    '''Read a single PACE tree decomposition from an iterator over lines'''
+    header = _tokens(lines)
+    nbags = int(header[2])
+    block = [' '.join(header)]
+    block += [' '.join(_tokens(lines)) for _ in range(2 * nbags - 1)]
+    return '\n'.join(block)
+
+
+def serve(instream, outstream):
+    '''Worker loop of the line protocol that is spoken by HomSubPool.
+
+    Commands are single lines, possibly followed by a block in PACE format:
+        graph <gid>       followed by a PACE graph, which is stored under gid
+        pattern <pid>     followed by a PACE graph and its PACE tree decomposition, stored under pid
+        count <pid> <gid> answers with a line containing the homomorphism count
+        quit              terminates the worker (as does the end of the input)'''
+
+    lines = iter(instream.readline, '')
+    graphs = dict()
+    schedules = dict()
+    while True:
+        command = _tokens(lines)
+        if command is None or command[0] == 'quit':
+            break
+        if command[0] == 'graph':
+            n, edges = _read_graph_block(lines)
+            graphs[command[1]] = (adjacency_from_edges(n, edges), np.ones(n, dtype=np.int64))
+        elif command[0] == 'pattern':
+            n, edges = _read_graph_block(lines)
+            pattern = nx.empty_graph(n)
+            pattern.add_edges_from(edges)
+            schedules[command[1]] = td_schedule(pattern, *parse_PACE_td(_read_td_block(lines)))
+        elif command[0] == 'count':
+            adj, present = graphs[command[2]]
+            outstream.write(f'{hom_count_td(schedules[command[1]], adj, present)}\n')
+            outstream.flush()
+        else:
+            raise ValueError(f'unknown command {command[0]}')
+
+
+def main(argv=None):
+    '''Command line interface that mirrors the counting interface of the HomSub binary.
+    Reads the tree decomposition of the pattern from tam.out in the working directory.
+
+    Without -batch, the graph file contains a single graph and a single count is printed.
+    With -batch, the graph file (or stdin, if it is -) contains concatenated PACE graphs and 
+    one count per graph is printed as soon as the graph is read.
+    With -serve, the process runs the line protocol of HomSubPool on stdin and stdout.'''
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('-count-hom', action='store_true')
+    parser.add_argument('-batch', action='store_true')
+    parser.add_argument('-serve', action='store_true')
+    parser.add_argument('-h', dest='pattern')
+    parser.add_argument('-g', dest='graph')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(sys.stdin, sys.stdout)
+        return
+
+    with open(args.pattern, 'r') as f:
+        n, edges = next(read_PACE_graphs(f))
+    pattern = nx.empty_graph(n)
+    pattern.add_edges_from(edges)
+    with open('tam.out', 'r') as f:
+        schedule = td_schedule(pattern, *parse_PACE_td(f.read()))
+
+    graph_file = sys.stdin if args.graph == '-' else open(args.graph, 'r')
+    for n, edges in read_PACE_graphs(graph_file):
+        count = hom_count_td(schedule, adjacency_from_edges(n, edges), np.ones(n, dtype=np.int64))
+        sys.stdout.write(f'{count}\n')
+        if not args.batch:
+            break
+        sys.stdout.flush()
+    graph_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import hashlib
+import sqlite3
+import numpy as np
+import networkx as nx
+
+from ghc.utils.canonical import pattern_certificate
+from ghc.utils.graph_store import graph_edges
+
+
+def _fingerprint(n, edges):
+    edges = np.sort(np.asarray(edges, dtype=np.int64).reshape(-1, 2), axis=1)
+    edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+    string = f'{n}:' + ','.join([f'{u}-{v}' for u, v in edges.tolist()])
+    return hashlib.sha1(string.encode()).hexdigest()
+
+
+def graph_fingerprint(g):
+    '''Content hash of a graph, i.e., of its vertex count and edge list with vertices
+    numbered in the order of g.nodes. It identifies the same dataset graph across runs.'''
+    return _fingerprint(*graph_edges([g], 0))
+
+
+def graph_fingerprints(graph_list):
+    '''graph_fingerprint of each graph. The graphs of a GraphStore are hashed from its 
+    edge arrays without creating networkx graphs.'''
+    return [_fingerprint(*graph_edges(graph_list, ig)) for ig in range(len(graph_list))]
+
+
+def _edge_string(pattern):
+    pattern = nx.convert_node_labels_to_integers(pattern)
+    return ','.join([f'{u}-{v}' for u, v in pattern.edges])
+
+
+def _from_edge_string(n, string):
+    pattern = nx.empty_graph(n)
+    if string != '':
+        pattern.add_edges_from([tuple(int(v) for v in e.split('-')) for e in string.split(',')])
+    return pattern
+
+
+class HomCache:
+    '''Persistent store of homomorphism counts in an SQLite database, keyed by
+    (graph fingerprint, pattern isomorphism class, kind). Isomorphism classes of patterns
+    are identified by pattern_certificate and an exact isomorphism test against the
+    stored representatives. Hence, counts are shared by all runs, pattern lists and
+    datasets that use the same file.
+
+    kind distinguishes the count semantics: 'int64' (as returned by HomSub), 'exact'
+    (python ints) and 'log' (natural logarithms). Counts are stored as text, such that
+    arbitrarily large ints fit.
+
+    The cache should be closed after use, e.g. by using it as a context manager.'''
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS patterns (id INTEGER PRIMARY KEY, certificate TEXT, n INTEGER, edges TEXT)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS pattern_certificates ON patterns (certificate)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS counts (graph TEXT, pattern INTEGER, kind TEXT, count TEXT, PRIMARY KEY (graph, pattern, kind))')
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def pattern_id(self, pattern):
+        '''Return the id of the isomorphism class of pattern, which is added if it is new'''
+        certificate = pattern_certificate(pattern)
+        rows = self.connection.execute('SELECT id, n, edges FROM patterns WHERE certificate = ?', (certificate,)).fetchall()
+        for i, n, edges in rows:
+            if nx.is_isomorphic(pattern, _from_edge_string(n, edges)):
+                return i
+        cursor = self.connection.execute('INSERT INTO patterns (certificate, n, edges) VALUES (?, ?, ?)',
+                                         (certificate, pattern.number_of_nodes(), _edge_string(pattern)))
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def lookup(self, pattern_ids, graph_ids, kind):
+        '''Return the [ngraphs, npatterns] object array of cached counts and the boolean
+        mask of the pairs that were found.'''
+        counts = np.zeros([len(graph_ids), len(pattern_ids)], dtype=object)
+        found = np.zeros([len(graph_ids), len(pattern_ids)], dtype=bool)
+        parse = float if kind == 'log' else int
+        graph_index = dict()
+        for ig, g in enumerate(graph_ids):
+            graph_index.setdefault(g, list()).append(ig)
+        for jp, p in enumerate(pattern_ids):
+            for g, c in self.connection.execute('SELECT graph, count FROM counts WHERE pattern = ? AND kind = ?', (p, kind)):
+                for ig in graph_index.get(g, []):
+                    counts[ig, jp] = parse(c)
+                    found[ig, jp] = True
+        return counts, found
+
+    def store(self, pattern_ids, graph_ids, counts, mask, kind):
+        '''Store the counts of the pairs where mask is True'''
+        rows = [(graph_ids[ig], pattern_ids[jp], kind, repr(float(counts[ig, jp])) if kind == 'log' else str(int(counts[ig, jp])))
+                for ig, jp in zip(*np.nonzero(mask))]
+        self.connection.executemany('INSERT OR REPLACE INTO counts (graph, pattern, kind, count) VALUES (?, ?, ?, ?)', rows)
+        self.connection.commit()
@@ -0,0 +1,105 @@
+import numpy as np
+import networkx as nx
+import scipy.sparse as sparse
+import scipy.sparse.csgraph as csgraph
+
+from ghc.utils.graph_store import GraphStore, graph_arrays
+
+INVARIANTS = ['bipartite', 'edges', 'clique_bound', 'loops']
+
+
+def component_counts(n, edges, membership, ngraphs):
+    '''Number of connected components of each graph, given the n vertices of all graphs, 
+    their [m, 2] edges and the graph of each vertex'''
+    adj = sparse.coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(n, n))
+    _, labels = csgraph.connected_components(adj, directed=False)
+    _, first = np.unique(labels, return_index=True)
+    return np.bincount(membership[first], minlength=ngraphs)
+
+
+def degeneracies(n, edges, membership, ngraphs):
+    '''Degeneracy of each graph (ignoring self-loops), i.e., its maximum core number, or -1 
+    for graphs without vertices. Vertices of degree at most k are peeled from all graphs at 
+    once, increasing k whenever there is none.'''
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    adj = sparse.coo_matrix((np.ones(len(edges), dtype=np.int64), (edges[:, 0], edges[:, 1])), shape=(n, n)).tocsr()
+    adj = adj + adj.T
+    degrees = np.asarray(adj.sum(axis=1)).ravel()
+    alive = np.ones(n, dtype=bool)
+    core = np.zeros(n, dtype=np.int64)
+    k = 0
+    while np.any(alive):
+        peel = alive & (degrees <= k)
+        if not np.any(peel):
+            k = np.min(degrees[alive])
+            continue
+        core[peel] = k
+        alive &= ~peel
+        degrees -= adj @ peel.astype(np.int64)
+    degeneracy = np.full(ngraphs, -1, dtype=np.int64)
+    np.maximum.at(degeneracy, membership, core)
+    return degeneracy
+
+
+def graph_invariants(graph_list):
+    '''Cheap invariants of the dataset graphs that certify zero homomorphism counts, as a
+    dict of arrays: bipartite, number of edges, an upper bound on the clique number
+    (degeneracy + 1) and whether the graph has self-loops.
+
+    They are computed for all graphs at once from the edge arrays (see graph_arrays). A graph 
+    is bipartite iff its bipartite double cover has twice as many components. The invariants
+    of a GraphStore are computed once and saved with it, see ghc.utils.data.save_graph_store.'''
+    if isinstance(graph_list, GraphStore) and graph_list.invariants is not None and set(INVARIANTS) <= set(graph_list.invariants):
+        return graph_list.invariants
+    node_counts, edge_offsets, edges = graph_arrays(graph_list)
+    ngraphs = len(node_counts)
+    node_offsets = np.concatenate([[0], np.cumsum(node_counts)]).astype(np.int64)
+    n = int(node_offsets[-1])
+    membership = np.repeat(np.arange(ngraphs), node_counts)
+    edge_graphs = np.repeat(np.arange(ngraphs), np.diff(edge_offsets))
+    edges = np.asarray(edges, dtype=np.int64) + node_offsets[edge_graphs][:, None]
+
+    # edges u-v of the double cover join the copies u, v + n and v, u + n
+    cover = np.vstack([edges + [0, n], edges[:, ::-1] + [0, n]])
+    components = component_counts(n, edges, membership, ngraphs)
+    cover_components = component_counts(2 * n, cover, np.concatenate([membership, membership]), ngraphs)
+    return {'bipartite': cover_components == 2 * components,
+            'edges': np.diff(edge_offsets).astype(np.int64),
+            'clique_bound': degeneracies(n, edges, membership, ngraphs) + 1,
+            'loops': np.bincount(edge_graphs[edges[:, 0] == edges[:, 1]], minlength=ngraphs) > 0}
+
+
+def pattern_invariants(pattern):
+    '''Invariants of a pattern that are compared to graph_invariants: bipartite, number of
+    edges and clique number. They are kept in pattern.graph['invariants'], such that they
+    are computed only once, e.g., when the pattern is sampled. As graph attributes are 
+    copied to subgraphs and patterns may be edited, kept invariants are only used if the 
+    vertices and edges match.'''
+    key = (frozenset(pattern.nodes), frozenset(frozenset(e) for e in pattern.edges))
+    invariants = pattern.graph.get('invariants')
+    if invariants is None or invariants['key'] != key:
+        invariants = {'key': key,
+                      'edges': pattern.number_of_edges(),
+                      'bipartite': nx.is_bipartite(pattern),
+                      'clique': max([len(c) for c in nx.find_cliques(pattern)], default=0)}
+        pattern.graph['invariants'] = invariants
+    return invariants
+
+
+def zero_pairs(pattern_list, invariants):
+    '''Boolean [ngraphs, npatterns] mask of the pairs whose homomorphism count is provably
+    zero, given the graph_invariants of the graphs. A homomorphism maps adjacent vertices to
+    adjacent, hence distinct, vertices. Thus, there is none if
+        - the pattern has edges and the graph has none,
+        - the pattern has an odd cycle (is not bipartite) and the graph is bipartite, or
+        - the pattern contains a clique that is larger than any clique of the graph.
+    Graphs with self-loops admit homomorphisms from every pattern and are never pruned.'''
+    patterns = [pattern_invariants(p) for p in pattern_list]
+    edges = np.array([p['edges'] for p in patterns], dtype=np.int64)
+    bipartite = np.array([p['bipartite'] for p in patterns], dtype=bool)
+    clique = np.array([p['clique'] for p in patterns], dtype=np.int64)
+
+    zero = (edges[None, :] > 0) & (invariants['edges'][:, None] == 0)
+    zero |= ~bipartite[None, :] & invariants['bipartite'][:, None]
+    zero |= clique[None, :] > invariants['clique_bound'][:, None]
+    return zero & ~invariants['loops'][:, None]
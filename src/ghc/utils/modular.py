@@ -0,0 +1,91 @@
+import numpy as np
+import networkx as nx
+
+from ghc.utils.graph_store import graph_arrays
+
+
+# residues are kept below 2^31, such that the product of two residues, and sums of
+# up to 2^32 residues, fit into int64
+PRIME_LIMIT = 2**31
+
+_primes = list()
+
+
+def _small_primes(limit):
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = False
+    return np.nonzero(sieve)[0]
+
+
+def crt_primes(count):
+    '''Return the count largest primes below PRIME_LIMIT'''
+    if len(_primes) < count:
+        divisors = _small_primes(int(PRIME_LIMIT ** 0.5) + 1)
+        candidate = PRIME_LIMIT - 1 if len(_primes) == 0 else _primes[-1] - 2
+        while len(_primes) < count:
+            if np.all(candidate % divisors != 0):
+                _primes.append(candidate)
+            candidate -= 2
+    return _primes[:count]
+
+
+def primes_for_bound(log2_bound):
+    '''Number of primes needed to uniquely represent nonnegative integers below 2^log2_bound'''
+    return max(1, int(np.ceil((log2_bound + 1) / 30)))
+
+
+def degree_log2_bounds(pattern, graph_sizes, max_degrees):
+    '''log2 of an upper bound on hom(F, G) for each graph G, given the numbers of vertices 
+    and the maximum degrees of the graphs.
+
+    Along a spanning forest of F, the root of each component has at most n images and every 
+    other vertex is mapped to one of at most max degree neighbors of the image of its parent, 
+    hence hom(F, G) <= prod over components C of n * max_degree^(|C|-1), which is at most n^|V(F)|.'''
+    ncomponents = nx.number_connected_components(pattern)
+    nfree = pattern.number_of_nodes() - ncomponents
+    graph_sizes = np.maximum(np.asarray(graph_sizes, dtype=np.float64), 1)
+    max_degrees = np.maximum(np.asarray(max_degrees, dtype=np.float64), 1)
+    return ncomponents * np.log2(graph_sizes) + nfree * np.log2(max_degrees)
+
+
+def graph_degree_arrays(graph_list):
+    '''Numbers of vertices and maximum degrees of all graphs'''
+    graph_sizes, edge_offsets, edges = graph_arrays(graph_list)
+    graph_sizes = np.asarray(graph_sizes, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(graph_sizes)])
+    # global vertex ids; a self-loop adds two to the degree, as in networkx
+    ends = (np.asarray(edges, dtype=np.int64) + np.repeat(offsets[:-1], np.diff(edge_offsets))[:, None]).ravel()
+    degrees = np.bincount(ends, minlength=offsets[-1])
+    max_degrees = np.zeros(len(graph_sizes), dtype=np.int64)
+    np.maximum.at(max_degrees, np.repeat(np.arange(len(graph_sizes)), graph_sizes), degrees)
+    return graph_sizes, max_degrees
+
+
+def predicted_overflow(pattern_list, graph_sizes, max_degrees, log2_limit=63):
+    '''Boolean [ngraphs, npatterns] mask of the pairs whose count may not fit into int64,
+    according to degree_log2_bounds. Counts of all other pairs are guaranteed to fit.'''
+    bounds = np.zeros([len(graph_sizes), len(pattern_list)])
+    for jp, pattern in enumerate(pattern_list):
+        bounds[:, jp] = degree_log2_bounds(pattern, graph_sizes, max_degrees)
+    return bounds >= log2_limit
+
+
+def crt_reconstruct(residues, primes):
+    '''Reconstruct integers from their residues modulo the given primes (chinese remainder theorem).
+
+    residues is an array of shape [len(primes), ...]. The result is an object array of python ints
+    of shape residues.shape[1:] that contains the unique values in [0, prod(primes)) with these residues.'''
+
+    residues = np.asarray(residues, dtype=np.int64)
+    x = residues[0].astype(object)
+    modulus = int(primes[0])
+    for r, p in zip(residues[1:], primes[1:]):
+        p = int(p)
+        # Garner's step: find t such that x + modulus * t = r mod p
+        t = ((r.astype(object) - x) % p) * pow(modulus % p, p - 2, p) % p
+        x = x + modulus * t
+        modulus *= p
+    return x
@@ -0,0 +1,187 @@
+import networkx as nx
+
+from ghc.utils.HomSubio import td_header
+
+
+def _adjacency_masks(pattern):
+    index = {v: i for i, v in enumerate(pattern.nodes)}
+    masks = [0 for _ in index]
+    for u, v in pattern.edges:
+        if u != v:
+            masks[index[u]] |= 1 << index[v]
+            masks[index[v]] |= 1 << index[u]
+    return masks
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def degeneracy(masks, remaining):
+    '''Largest minimum degree of a subgraph of the subgraph induced by the vertex set
+    remaining (a bit mask), which is a lower bound of its treewidth'''
+    best = 0
+    while remaining:
+        degrees = {v: bin(masks[v] & remaining).count('1') for v in _bits(remaining)}
+        v = min(degrees, key=degrees.get)
+        best = max(best, degrees[v])
+        remaining &= ~(1 << v)
+    return best
+
+
+def min_fill_ordering(masks):
+    '''Greedy elimination ordering that eliminates a vertex with the fewest fill edges
+    (ties are broken by degree). Returns the ordering and its width.'''
+    masks = list(masks)
+    remaining = (1 << len(masks)) - 1
+    order = list()
+    width = 0
+    while remaining:
+        best = None
+        for v in _bits(remaining):
+            neighbors = list(_bits(masks[v]))
+            fill = sum(1 for i, u in enumerate(neighbors) for w in neighbors[i + 1:] if not masks[u] >> w & 1)
+            if best is None or (fill, len(neighbors)) < best[0]:
+                best = ((fill, len(neighbors)), v)
+        v = best[1]
+        width = max(width, best[0][1])
+        # make the neighborhood a clique and remove v
+        for u in _bits(masks[v]):
+            masks[u] = (masks[u] | masks[v]) & ~(1 << u) & ~(1 << v)
+        masks[v] = 0
+        remaining &= ~(1 << v)
+        order.append(v)
+    return order, width
+
+
+def exact_ordering(masks, vertices):
+    '''Elimination ordering of minimum width of the subgraph induced by the given vertices,
+    by dynamic programming over vertex subsets (Bodlaender et al., On exact algorithms for
+    treewidth). Takes O(2^n n^2) time, hence it is only feasible for small n.
+    Returns the ordering and its width.'''
+    n = len(vertices)
+    local = {v: i for i, v in enumerate(vertices)}
+    adjacency = [sum(1 << local[u] for u in _bits(masks[v]) if u in local) for v in vertices]
+
+    def q(S, v):
+        # number of vertices outside S + v that are reachable from v via S, i.e., the
+        # degree of v when it is eliminated after the vertices in S
+        component = 1 << v
+        frontier = component
+        while frontier:
+            reached = 0
+            for u in _bits(frontier):
+                reached |= adjacency[u]
+            frontier = reached & S & ~component
+            component |= frontier
+        reached = 0
+        for u in _bits(component):
+            reached |= adjacency[u]
+        return bin(reached & ~S & ~(1 << v)).count('1')
+
+    width = [-1 for _ in range(1 << n)]
+    last = [-1 for _ in range(1 << n)]
+    for S in range(1, 1 << n):
+        for v in _bits(S):
+            w = max(width[S & ~(1 << v)], q(S & ~(1 << v), v))
+            if last[S] == -1 or w < width[S]:
+                width[S], last[S] = w, v
+
+    order = list()
+    S = (1 << n) - 1
+    while S:
+        order.append(vertices[last[S]])
+        S &= ~(1 << last[S])
+    return order[::-1], max(width[(1 << n) - 1], 0)
+
+
+def ordering_decomposition(masks, order):
+    '''Tree decomposition of the elimination ordering. Each bag is an eliminated vertex and
+    its neighbors at elimination time. Bags that are contained in a neighboring bag are
+    merged into it, and the trees of disconnected components are joined to a single tree.
+    Returns the bags (as sets) and the edges of the decomposition.'''
+    masks = list(masks)
+    position = {v: i for i, v in enumerate(order)}
+    bags = list()
+    parent = list()
+    for v in order:
+        bags.append({v} | set(_bits(masks[v])))
+        later = list(_bits(masks[v]))
+        parent.append(min(position[u] for u in later) if len(later) > 0 else None)
+        for u in later:
+            masks[u] = (masks[u] | masks[v]) & ~(1 << u) & ~(1 << v)
+
+    # join the roots of the components
+    roots = [i for i, p in enumerate(parent) if p is None]
+    for a, b in zip(roots[:-1], roots[1:]):
+        parent[a] = b
+    neighbors = [set() for _ in bags]
+    for i, p in enumerate(parent):
+        if p is not None:
+            neighbors[i].add(p)
+            neighbors[p].add(i)
+
+    # merge bags into neighbors that contain them
+    alive = set(range(len(bags)))
+    merged = True
+    while merged:
+        merged = False
+        for a in alive:
+            b = next((b for b in neighbors[a] if bags[a] <= bags[b]), None)
+            if b is not None:
+                for c in neighbors[a] - {b}:
+                    neighbors[c].discard(a)
+                    neighbors[c].add(b)
+                    neighbors[b].add(c)
+                neighbors[b].discard(a)
+                alive.remove(a)
+                merged = True
+                break
+
+    # number the bags in reverse elimination order
+    alive = sorted(alive, reverse=True)
+    index = {b: i for i, b in enumerate(alive)}
+    td_edges = [(index[a], index[b]) for a in alive for b in neighbors[a] if a < b]
+    return [bags[b] for b in alive], td_edges
+
+
+def PACE_td_format(n, bags, td_edges):
+    '''Tree decomposition in PACE format, with 0-based bags and bag indices'''
+    string = f's td {len(bags)} {max(len(bag) for bag in bags)} {n}\n'
+    string += ''.join([f'b {i + 1} ' + ' '.join([str(v + 1) for v in sorted(bag)]) + '\n' for i, bag in enumerate(bags)])
+    string += ''.join([f'{min(a, b) + 1} {max(a, b) + 1}\n' for a, b in td_edges])
+    return string
+
+
+def pattern_tree_decomposition(pattern, td=None, exact_limit=10):
+    '''Tree decomposition of small width of a pattern with vertices 0..n-1, in PACE format.
+
+    Components with at most exact_limit vertices get a decomposition of minimum width, unless
+    the min fill-in heuristic already matches the degeneracy lower bound. Larger components
+    use the min fill-in heuristic. If a decomposition td (in PACE format) is given, e.g., the
+    one of the k-tree a pattern was sampled from, it is returned if it is not wider.'''
+    n = pattern.number_of_nodes()
+    if n == 0:
+        raise ValueError('pattern has no vertices')
+    masks = _adjacency_masks(pattern)
+
+    # components are eliminated one after the other
+    order = list()
+    width = 0
+    for component in nx.connected_components(pattern):
+        vertices = sorted(component)
+        sub_order, sub_width = min_fill_ordering([masks[v] if v in component else 0 for v in range(n)])
+        # the vertices of the other components have no edges in this subgraph and are skipped
+        sub_order = [v for v in sub_order if v in component]
+        if len(vertices) <= exact_limit and sub_width > degeneracy(masks, sum(1 << v for v in vertices)):
+            sub_order, sub_width = exact_ordering(masks, vertices)
+        order += sub_order
+        width = max(width, sub_width)
+
+    if td is not None and td_header(td)[1] <= width + 1:
+        return td
+    bags, td_edges = ordering_decomposition(masks, order)
+    return PACE_td_format(n, bags, td_edges)
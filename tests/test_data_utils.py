@@ -41,3 +41,19 @@ def test_augment_data():
     for i, xi in enumerate(X):
         assert xi.shape[0] == new_X[2*i].shape[0]+1 == new_X[2*i+1].shape[0]+1
         assert xi.shape[1] == new_X[2*i].shape[1] == new_X[2*i+1].shape[1]
+
+
+def test_graph_store(tmp_path):
+    import shutil
+    from ghc.utils.data import save_graph_store
+    from ghc.utils.graph_store import GraphStore
+    for suffix in ['.graph', '.y']:
+        shutil.copy("./tests/MUTAG" + suffix, tmp_path / ("MUTAG" + suffix))
+    graphs, _, y = load_data("MUTAG", tmp_path)
+    save_graph_store("MUTAG", tmp_path)
+    store, X, store_y = load_data("MUTAG", tmp_path)
+    assert isinstance(store, GraphStore) and len(store) == len(graphs)
+    assert np.array_equal(store_y, y)
+    for g, h, x in zip(graphs, store, X):
+        assert h.number_of_nodes() == g.number_of_nodes() == x.shape[0]
+        assert h.number_of_edges() == g.number_of_edges()
@@ -0,0 +1,153 @@
+import numpy as np
+import networkx as nx
+from ghc.generate_k_tree import get_pattern_list, sample_partial_ktrees, draw_patterns, pattern_rngs
+from ghc.utils.HomSubio import td_costs, td_header
+from ghc.utils.canonical import isomorphism_classes
+
+
+graphs = [nx.path_graph(20), nx.cycle_graph(30), nx.complete_graph(10)]
+
+
+def test_distinct_patterns():
+    patterns, tds = get_pattern_list(6, 10, min_size=4, distinct=True)
+    assert len(patterns) == 10 and len(tds) == 10
+    unique, _ = isomorphism_classes(patterns)
+    assert len(unique) == 10
+
+
+def test_cost_budget():
+    n = np.array([g.number_of_nodes() for g in graphs])
+    m = np.array([g.number_of_edges() for g in graphs])
+    # the budget admits patterns with bags of size at most three
+    budget = np.sum(td_costs('s td 8 3 10\n', n, m))
+    patterns, tds = get_pattern_list(10, 20, graphs=graphs, cost_budget=budget)
+    assert len(patterns) == 20
+    assert all(np.sum(td_costs(td, n, m)) <= budget for td in tds)
+
+
+def test_sample_partial_ktrees():
+    sizes = np.array([1, 2, 5, 8, 8, 12])
+    treewidths = np.array([0, 1, 2, 3, 3, 11])
+    batch = sample_partial_ktrees(sizes, treewidths, p=1.0, rngs=pattern_rngs(range(6), seed=0))
+    assert len(batch) == 6
+    for i, (n, k) in enumerate(zip(sizes, treewidths)):
+        pattern, bags = batch.graph(i), batch.bags[i]
+        # without deleting edges, the patterns are k-trees
+        assert pattern.number_of_edges() == k * (k + 1) // 2 + (n - k - 1) * k
+        td = nx.Graph(batch.td_edges[i].tolist())
+        td.add_nodes_from(range(len(bags)))
+        assert nx.is_tree(td)
+        assert all(any(u in bag and v in bag for bag in bags) for u, v in pattern.edges)
+        assert all(nx.is_connected(td.subgraph([t for t, bag in enumerate(bags) if v in bag])) for v in range(n))
+        assert batch.td_string(i).startswith(f's td {n - k} {k + 1} {n}\n')
+
+
+def test_reproducible_patterns():
+    patterns, tds = get_pattern_list(8, 10, seed=3, run_id=1)
+    patterns_again, tds_again = get_pattern_list(8, 10, seed=3, run_id=1)
+    assert tds == tds_again
+    assert all(sorted(p.edges) == sorted(q.edges) for p, q in zip(patterns, patterns_again))
+    _, tds_other_run = get_pattern_list(8, 10, seed=3, run_id=2)
+    assert tds != tds_other_run
+
+    # draws do not depend on the batches in which they are sampled
+    serial = draw_patterns(8, range(10), seed=3)
+    parts = [draw_patterns(8, range(0, 4), seed=3), draw_patterns(8, range(4, 10), seed=3)]
+    parallel = [(batch, i) for batch in parts for i in range(len(batch))]
+    for j, (batch, i) in enumerate(parallel):
+        assert serial.td_string(j) == batch.td_string(i)
+        assert np.array_equal(serial.edges[j], batch.edges[i])
+
+
+def test_max_treewidth():
+    patterns, tds = get_pattern_list(8, 30, seed=0, max_treewidth=1)
+    assert all(nx.is_forest(p) for p in patterns)
+    assert all(td_header(td)[1] <= 2 for td in tds)
+
+
+def test_retry_rounds(monkeypatch, capsys):
+    import io
+    import pickle
+    import contextlib
+    import ghc.generate_k_tree as gkt
+    from ghc.utils.modular import graph_degree_arrays, predicted_overflow
+    # counts of patterns with at least four vertices in the large star may overflow int64
+    graphs = [nx.star_graph(2**16), nx.cycle_graph(6)]
+    calls = list()
+
+    def fake_backend(backend, exact=False, **kwargs):
+        def count(pattern_list, graph_list, td_list, out=None, columns=None, **kwargs):
+            calls.append((exact, pattern_list))
+            # patterns whose number of edges is 1 mod 3 fail, 2 mod 3 overflow
+            m = np.array([p.number_of_edges() for p in pattern_list], dtype=np.int64)
+            counts = np.where(m % 3 == 1, -1, np.where(m % 3 == 2, -7, m))
+            counts = np.repeat(counts[None, :], len(graph_list), axis=0).astype(object if exact else np.int64)
+            if out is None:
+                return counts
+            out[:, columns] = counts
+            return out
+        return contextlib.nullcontext(count)
+
+    monkeypatch.setattr(gkt, 'get_count_backend', fake_backend)
+    profile = dict(size=14, pattern_count=12, seed=0, dedup_graphs=False, add_small_patterns=False)
+    pattern_file = io.BytesIO()
+    embeddings = gkt.random_ktree_profile(graphs, max_retry_rounds=3, pattern_file=pattern_file, overflow='exact', **profile)
+    patterns = pickle.loads(pattern_file.getvalue())
+    # the columns belong to the kept patterns
+    assert embeddings.shape == (len(graphs), len(patterns))
+    assert all(np.all(embeddings[:, j] == p.number_of_edges()) for j, p in enumerate(patterns))
+    assert all(p.number_of_edges() % 3 == 0 for p in patterns)
+    # the initial batch and at most 3 rounds, risky patterns are always counted exactly
+    assert len([exact for exact, _ in calls if not exact]) <= 4
+    degree_arrays = graph_degree_arrays(graphs)
+    assert any(exact for exact, _ in calls)
+    assert all(exact or not np.any(predicted_overflow(ps, *degree_arrays)) for exact, ps in calls if len(ps) > 0)
+    out = capsys.readouterr().out
+    assert 'patterns failed' in out and 'overflowed' in out
+
+    # no retry rounds without time
+    calls.clear()
+    gkt.random_ktree_profile(graphs, max_retry_time=0, **profile)
+    assert len(calls) == 1
+
+
+def test_profile_of_graph_store(tmp_path, monkeypatch):
+    import ghc.generate_k_tree as gkt
+    from ghc.utils.graph_store import GraphStore
+    graphs = [nx.cycle_graph(5), nx.path_graph(4), nx.complete_graph(4), nx.petersen_graph(), nx.cycle_graph(5), nx.star_graph(3)]
+    profile = dict(pattern_count=12, seed=0, backend='dp', add_small_patterns=True)
+    expected = gkt.random_ktree_profile(graphs, **profile)
+
+    store = GraphStore.from_graphs(graphs)
+    materialized = list()
+    getitem = GraphStore.__getitem__
+    monkeypatch.setattr(GraphStore, '__getitem__', lambda self, i: materialized.append(i) or getitem(self, i))
+    assert np.array_equal(gkt.random_ktree_profile(store, hom_cache=str(tmp_path / 'counts.sqlite'), **profile), expected)
+    # only the two 5-cycles share a WL certificate and are tested for isomorphism
+    assert materialized == [0, 4]
+    classes, inverse = gkt.graph_classes(store)
+    assert isinstance(classes, GraphStore) and len(classes) == 5 and list(inverse) == [0, 1, 2, 3, 0, 4]
+
+
+def test_profile_relative_to_wl():
+    import ghc.generate_k_tree as gkt
+    graphs = [nx.cycle_graph(6), nx.disjoint_union(nx.cycle_graph(3), nx.cycle_graph(3)), nx.path_graph(5), nx.star_graph(4)]
+    metadata = [{'idx': i, 'split': 'train' if i < 3 else 'test'} for i in range(len(graphs))]
+    # patterns are added one at a time until they distinguish the training graphs as well as 2 WL iterations
+    embeddings = gkt.random_ktree_profile_relative_to_wl(graphs, pattern_count=-2, metadata=metadata, add_small_patterns=True, 
+                                                         backend='homsub_pool', seed=0, early_stopping=2)
+    assert embeddings.shape[0] == len(graphs) and embeddings.shape[1] >= 4
+    assert embeddings[:, 0].tolist() == [len(g.nodes) for g in graphs]
+
+
+def test_batch_Nk_strategy():
+    from ghc.generate_k_tree import Nk_strategy_fiddly, Nk_strategy_fiddly_uniform
+    rng = np.random.default_rng(0)
+    sizes, treewidths = Nk_strategy_fiddly(20, 100000, min_size=4, rng=rng)
+    batch_sizes, batch_treewidths = Nk_strategy_fiddly_uniform(20, rng.random([100000, 3]), min_size=4)
+    # both invert the same distributions
+    assert np.min(batch_sizes) == 5 and abs(np.mean(batch_sizes) / np.mean(sizes) - 1) < 0.02
+    assert np.min(batch_treewidths) == 1 and abs(np.mean(batch_treewidths) / np.mean(treewidths) - 1) < 0.02
+    assert np.all(batch_treewidths <= batch_sizes - 1)
+    _, bounded = Nk_strategy_fiddly_uniform(20, rng.random([1000, 3]), min_size=4, max_treewidth=2)
+    assert np.max(bounded) == 2
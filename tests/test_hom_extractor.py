@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import pickle
+import subprocess
+import numpy as np
+import networkx as nx
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOM = os.path.join(REPO, 'pattern_extractors', 'hom.py')
+
+
+def write_dataset(dloc, name='TOY'):
+    graphs = [nx.cycle_graph(5), nx.path_graph(4), nx.complete_graph(4), nx.petersen_graph(), nx.cycle_graph(5)]
+    with open(os.path.join(dloc, name + '.graph'), 'wb') as f:
+        pickle.dump(graphs, f)
+    with open(os.path.join(dloc, name + '.y'), 'wb') as f:
+        pickle.dump([0, 1, 0, 1, 0], f)
+    with open(os.path.join(dloc, name + '.meta'), 'w') as f:
+        json.dump([{'idx': i} for i in range(len(graphs))], f)
+    return graphs
+
+
+def run_hom(dloc, *args):
+    '''Run pattern_extractors/hom.py as the experiments do and return the saved features and patterns'''
+    subprocess.run([sys.executable, HOM, '--data', 'toy', '--dloc', str(dloc), '--oloc', str(dloc), '--hom_type', 'full_kernel',
+                    '--hom_size', '5', '--pattern_count', '6', '--backend', 'dp', '--seed', '0'] + list(args), cwd=REPO, check=True)
+    with open(os.path.join(dloc, 'TOY_full_kernel_5_6_0.hom'), 'rb') as f:
+        homX = pickle.load(f)
+    with open(os.path.join(dloc, 'TOY_full_kernel_5_6_0.patterns'), 'rb') as f:
+        patterns = pickle.load(f)
+    for suffix in ['.hom', '.patterns', '.homson']:
+        os.remove(os.path.join(dloc, 'TOY_full_kernel_5_6_0' + suffix))
+    return homX, patterns
+
+
+def test_help():
+    result = subprocess.run([sys.executable, HOM, '--help'], cwd=REPO, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert '--backend' in result.stdout
+
+
+def test_small_run(tmp_path):
+    graphs = write_dataset(tmp_path)
+    homX, _ = run_hom(tmp_path)
+    assert homX.shape == (len(graphs), 6)
+    # the first patterns are the singleton and the edge
+    assert homX[:, 0].tolist() == [len(g.nodes) for g in graphs]
+    assert homX[:, 1].tolist() == [2 * len(g.edges) for g in graphs]
+    # the counts file of the running computation is removed
+    assert sorted(os.listdir(tmp_path)) == ['TOY.graph', 'TOY.meta', 'TOY.y']
+
+
+def test_flags(tmp_path):
+    write_dataset(tmp_path)
+    homX, _ = run_hom(tmp_path)
+    exact, _ = run_hom(tmp_path, '--exact')
+    assert exact.dtype == object and np.array_equal(exact.astype(np.int64), homX)
+    log, _ = run_hom(tmp_path, '--log')
+    with np.errstate(divide='ignore'):
+        assert np.allclose(log, np.log(homX.astype(float)))
+    _, patterns = run_hom(tmp_path, '--max_treewidth', '1')
+    # the small patterns are followed by sampled patterns of treewidth one
+    assert all(nx.is_forest(p) for p in patterns[4:])
+
+
+def test_density_requires_log(tmp_path):
+    write_dataset(tmp_path)
+    result = subprocess.run([sys.executable, HOM, '--data', 'toy', '--dloc', str(tmp_path), '--oloc', str(tmp_path), 
+                             '--hom_type', 'full_kernel', '--backend', 'dp', '--density'], cwd=REPO, capture_output=True, text=True)
+    assert result.returncode != 0 and '--density requires --log' in result.stderr
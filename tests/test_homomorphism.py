@@ -0,0 +1,461 @@
+import os
+import sys
+import itertools
+from functools import partial
+import pytest
+import numpy as np
+import networkx as nx
+from ghc.utils.hom_dp import HomDP, parse_PACE_td, td_schedule
+from ghc.utils.HomSubio import HomSub, HomSubPool, required_pairs, open_result_array, pair_costs, \
+                              longest_processing_time_first
+from ghc.utils.fast_hom import dataset_adjacency, is_tree_pattern, forest_hom_counts, forest_log_hom_counts, \
+                              cycle_length, graph_spectra, cycle_hom_counts
+from ghc.utils.counting import count_patterns
+from ghc.utils.canonical import isomorphism_classes
+from ghc.utils.homcache import HomCache
+from ghc.utils.checkpoint import ResumableRun
+from ghc.utils.tree_decomposition import pattern_tree_decomposition
+
+
+def brute_force_hom(pattern, graph):
+    '''Count homomorphisms by enumerating all maps'''
+    count = 0
+    for image in itertools.product(list(graph.nodes), repeat=pattern.number_of_nodes()):
+        phi = dict(zip(pattern.nodes, image))
+        if all(graph.has_edge(phi[u], phi[v]) for u, v in pattern.edges):
+            count += 1
+    return count
+
+
+def single_bag_td(pattern):
+    '''Trivial tree decomposition with all vertices in one bag'''
+    n = pattern.number_of_nodes()
+    return f's td 1 {n} {n}\nb 1 ' + ' '.join([str(v + 1) for v in range(n)]) + '\n'
+
+
+def path4():
+    return nx.path_graph(4), 's td 3 2 4\nb 1 1 2\nb 2 2 3\nb 3 3 4\n1 2\n2 3\n'
+
+
+def cycle4():
+    return nx.cycle_graph(4), 's td 2 3 4\nb 1 1 2 3\nb 2 1 3 4\n1 2\n'
+
+
+def star_with_isolated():
+    g = nx.empty_graph(5)
+    g.add_edges_from([(0, 1), (0, 2), (0, 3)])
+    return g, 's td 4 2 5\nb 1 1 2\nb 2 1 3\nb 3 1 4\nb 4 5\n1 2\n1 3\n3 4\n'
+
+
+def triangle():
+    g = nx.cycle_graph(3)
+    return g, single_bag_td(g)
+
+
+graphs = [nx.path_graph(5), nx.cycle_graph(5), nx.complete_graph(4), nx.petersen_graph(), nx.empty_graph(3)]
+
+
+@pytest.mark.parametrize("pattern, td", [path4(), cycle4(), star_with_isolated(), triangle()])
+def test_hom_dp_brute_force(pattern, td):
+    counts = HomDP([pattern], graphs, [td])
+    assert counts.shape == (len(graphs), 1)
+    for ig, g in enumerate(graphs):
+        assert counts[ig, 0] == brute_force_hom(pattern, g)
+
+
+def test_hom_dp_min_embedding():
+    pattern, td = cycle4()
+    counts = HomDP([pattern], [nx.complete_graph(3), nx.complete_graph(4)], [td], min_embedding=True)
+    assert counts[0, 0] == 0
+    assert counts[1, 0] == brute_force_hom(pattern, nx.complete_graph(4))
+
+
+def test_td_must_cover_edges():
+    pattern, _ = cycle4()
+    td = 's td 2 3 4\nb 1 1 2 3\nb 2 2 3 4\n1 2\n'
+    with pytest.raises(ValueError):
+        td_schedule(pattern, *parse_PACE_td(td))
+
+
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_homsub_batch_protocol(batch_size, tmp_path, monkeypatch):
+    import tempfile
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated())
+    executable = [sys.executable, '-m', 'ghc.utils.hom_dp']
+    counts = HomSub(list(patterns), graphs, list(tds), min_embedding=True, n_jobs=2,
+                    batch=True, batch_size=batch_size, executable=executable, sort_by_size=True)
+    assert np.all(counts == HomDP(list(patterns), graphs, list(tds), min_embedding=True))
+    # the files for HomSub are removed
+    assert os.listdir(tmp_path) == []
+
+
+def test_protocol_default_executable():
+    # batch mode and the pool do not call the HomSub binary, which does not support them
+    patterns, tds = zip(path4(), triangle())
+    expected = HomDP(list(patterns), graphs, list(tds))
+    assert np.all(HomSub(list(patterns), graphs, list(tds), batch=True) == expected)
+    with HomSubPool() as pool:
+        assert np.all(pool(list(patterns), graphs, list(tds)) == expected)
+
+
+def test_homsub_pool_protocol():
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    executable = [sys.executable, '-m', 'ghc.utils.hom_dp']
+    expected = HomDP(list(patterns), graphs, list(tds), min_embedding=True)
+    with HomSubPool(n_jobs=2, executable=executable) as pool:
+        counts = pool(list(patterns), graphs, list(tds), min_embedding=True)
+        assert np.all(counts == expected)
+        # incremental calls reuse graphs that the workers already know
+        for jp in range(len(patterns)):
+            counts = pool([patterns[jp]], graphs, [tds[jp]], min_embedding=True, chunk_size=3, sort_by_size=True)
+            assert np.all(counts[:, 0] == expected[:, jp])
+        # graphs of a GraphStore are sent from their edge arrays, and the pool keeps no graphs
+        from ghc.utils.graph_store import GraphStore
+        store = GraphStore.from_graphs(graphs)
+        assert np.all(pool(list(patterns), store, list(tds), min_embedding=True) == expected)
+        assert len(store._graphs) == 0
+        assert all(any(sent is p for p in patterns) for sent in pool.sent.values())
+
+
+def test_required_pairs():
+    patterns = [nx.path_graph(2), nx.path_graph(5), nx.path_graph(11)]
+    required = required_pairs(patterns, graphs, min_embedding=True)
+    assert required.tolist() == [[len(g.nodes) >= len(p.nodes) for p in patterns] for g in graphs]
+    pair_mask = np.zeros([len(graphs), len(patterns)], dtype=bool)
+    pair_mask[1, 1] = True
+    assert np.all(required_pairs(patterns, graphs, pair_mask=pair_mask) == pair_mask)
+    assert np.all(required_pairs(patterns, graphs))
+
+
+def test_pair_costs():
+    patterns, tds = zip(path4(), cycle4(), triangle())
+    costs = pair_costs(list(patterns), graphs, list(tds))
+    assert costs.shape == (len(graphs), len(patterns))
+    # wider bags and larger graphs are more expensive
+    assert np.all(costs[:, 0] < costs[:, 1])
+    assert costs[3, 1] > costs[0, 1]
+    assignment = longest_processing_time_first([5, 1, 4, 2, 3], 2)
+    assert [list(a) for a in assignment] == [[0, 3, 1], [2, 4]]
+
+
+def test_homsub_timeout():
+    executable = [sys.executable, '-c', 'import time; time.sleep(10)']
+    pattern, td = triangle()
+    counts = HomSub([pattern], graphs[:2], [td], executable=executable, n_jobs=2, timeout=0.5)
+    assert np.all(counts == -1)
+
+
+def test_forest_fast_path():
+    patterns = [nx.path_graph(1), nx.path_graph(2), nx.star_graph(3), star_with_isolated()[0],
+                nx.disjoint_union(nx.path_graph(3), nx.path_graph(2))]
+    adj, membership = dataset_adjacency(graphs)
+    for pattern in patterns:
+        assert is_tree_pattern(pattern)
+        counts = forest_hom_counts(pattern, adj, membership)
+        assert list(counts) == [brute_force_hom(pattern, g) for g in graphs]
+    assert not is_tree_pattern(cycle4()[0])
+
+
+@pytest.mark.parametrize("spectral_limit", [2**40, 0])
+def test_cycle_fast_path(spectral_limit):
+    spectra = graph_spectra(graphs)
+    for k in range(3, 6):
+        pattern = nx.cycle_graph(k)
+        assert cycle_length(pattern) == k
+        counts = cycle_hom_counts(k, graphs, spectra, spectral_limit=spectral_limit)
+        assert list(counts) == [brute_force_hom(pattern, g) for g in graphs]
+    assert cycle_length(nx.disjoint_union(nx.cycle_graph(3), nx.cycle_graph(3))) is None
+    assert cycle_length(nx.path_graph(3)) is None
+
+
+@pytest.mark.parametrize("min_embedding", [False, True])
+def test_count_patterns_dispatch(min_embedding):
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    expected = HomDP(list(patterns), graphs, list(tds), min_embedding=min_embedding)
+    counts = count_patterns(HomDP, list(patterns), graphs, list(tds), min_embedding=min_embedding)
+    assert np.all(counts == expected)
+
+
+def test_exact_counts_do_not_overflow():
+    # hom(P_k, K_n) = n (n-1)^(k-1) exceeds int64 for these sizes
+    k, n = 16, 30
+    path = nx.path_graph(k)
+    td = f's td {k-1} 2 {k}\n' + '\n'.join([f'b {i+1} {i+1} {i+2}' for i in range(k-1)]) + '\n' \
+         + ''.join([f'{i+1} {i+2}\n' for i in range(k-2)])
+    patterns = [path, nx.cycle_graph(k), nx.complete_graph(4)]
+    tds = [td, None, single_bag_td(nx.complete_graph(4))]
+    counts = count_patterns(partial(HomDP, exact=True), patterns, [nx.complete_graph(n)], tds, exact=True)
+    assert counts.dtype == object
+    assert counts[0, 0] == n * (n - 1) ** (k - 1)
+    assert counts[0, 1] == (n - 1) ** k + (n - 1) * (-1) ** k
+    assert counts[0, 2] == n * (n - 1) * (n - 2) * (n - 3)
+    assert np.all(HomDP(patterns[::2], [nx.complete_graph(n)], tds[::2], exact=True) == counts[:, ::2])
+
+    # branching trees and forests multiply residues by sums over many neighbors
+    tree = nx.union(nx.path_graph(8), nx.relabel_nodes(nx.path_graph(8), lambda v: v + 8))
+    tree.add_edge(0, 8)
+    forest = nx.disjoint_union(tree, nx.star_graph(5))
+    counts = count_patterns(HomDP, [tree, forest], [nx.complete_graph(40)], [None, None], exact=True)
+    assert counts[0, 0] == 40 * 39 ** 15
+    assert counts[0, 1] == 40 * 39 ** 15 * 40 * 39 ** 5
+
+
+@pytest.mark.parametrize("pattern, td", [path4(), cycle4(), star_with_isolated(), triangle()])
+def test_exact_counts_small(pattern, td):
+    assert np.all(HomDP([pattern], graphs, [td], exact=True) == HomDP([pattern], graphs, [td]))
+
+
+@pytest.mark.parametrize("min_embedding", [False, True])
+def test_log_counts(min_embedding):
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    expected = HomDP(list(patterns), graphs, list(tds), min_embedding=min_embedding)
+    with np.errstate(divide='ignore'):
+        expected = np.log(expected.astype(float))
+    assert np.allclose(HomDP(list(patterns), graphs, list(tds), min_embedding=min_embedding, log=True), expected)
+    counts = count_patterns(partial(HomDP, log=True), list(patterns), graphs, list(tds), min_embedding=min_embedding, log=True)
+    assert np.allclose(counts, expected)
+
+
+def test_log_counts_do_not_overflow():
+    k, n = 40, 300
+    adj, membership = dataset_adjacency([nx.complete_graph(n)])
+    counts = forest_log_hom_counts(nx.path_graph(k), adj, membership)
+    assert np.isclose(counts[0], np.log(n) + (k - 1) * np.log(n - 1))
+
+
+def test_isomorphism_classes():
+    relabeled = nx.relabel_nodes(nx.path_graph(4), {0: 2, 1: 0, 2: 3, 3: 1})
+    patterns = [nx.path_graph(4), nx.star_graph(3), relabeled, nx.cycle_graph(4), nx.star_graph(3)]
+    unique, inverse = isomorphism_classes(patterns)
+    assert list(unique) == [0, 1, 3]
+    assert list(inverse) == [0, 1, 0, 2, 1]
+
+
+def test_count_patterns_dedup():
+    patterns, tds = zip(path4(), cycle4(), path4(), triangle(), cycle4())
+    calls = list()
+    def count_homs(pattern_list, **kwargs):
+        calls.append(len(pattern_list))
+        return HomDP(pattern_list, **kwargs)
+    counts = count_patterns(count_homs, list(patterns), graphs, list(tds), fast_paths=False)
+    assert calls == [3]
+    assert np.all(counts == HomDP(list(patterns), graphs, list(tds)))
+
+
+@pytest.mark.parametrize("min_embedding", [False, True])
+def test_hom_cache(tmp_path, min_embedding):
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    expected = HomDP(list(patterns), graphs, list(tds), min_embedding=min_embedding)
+    calls = list()
+    def count_homs(pair_mask, **kwargs):
+        calls.append(np.sum(pair_mask))
+        return HomDP(pair_mask=pair_mask, **kwargs)
+    with HomCache(str(tmp_path / 'homs.sqlite')) as cache:
+        counts = count_patterns(count_homs, list(patterns), graphs, list(tds), min_embedding=min_embedding, fast_paths=False, cache=cache)
+        assert np.all(counts == expected)
+    # a new run with a relabeled pattern and an additional graph only counts the new graph
+    relabeled = nx.relabel_nodes(patterns[1], {0: 3, 1: 0, 2: 1, 3: 2})
+    with HomCache(str(tmp_path / 'homs.sqlite')) as cache:
+        counts = count_patterns(count_homs, [relabeled], graphs + [nx.cycle_graph(6)], [tds[1]], min_embedding=min_embedding, fast_paths=False, cache=cache)
+    assert calls[-1] == 1
+    assert np.all(counts[:-1, 0] == expected[:, 1])
+    assert counts[-1, 0] == brute_force_hom(patterns[1], nx.cycle_graph(6))
+
+
+def test_result_array(tmp_path):
+    patterns, tds = zip(path4(), cycle4(), path4(), triangle())
+    expected = HomDP(list(patterns), graphs, list(tds), min_embedding=True)
+    path = str(tmp_path / 'counts.npy')
+    out = open_result_array(path, [len(graphs), len(patterns) + 1], fill=-1)
+    counts = count_patterns(HomDP, list(patterns), graphs, list(tds), min_embedding=True, out=out, columns=[4, 3, 2, 1])
+    assert counts is out
+    out.flush()
+    stored = np.load(path, mmap_mode='r')
+    assert np.all(stored[:, 0] == -1)
+    assert np.all(stored[:, [4, 3, 2, 1]] == expected)
+
+
+def test_resumable_run(tmp_path):
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    expected = HomDP(list(patterns), graphs, list(tds), min_embedding=True)
+    run = ResumableRun(str(tmp_path / 'work'))
+    assert run.load_patterns() is None
+    run.save_patterns(list(patterns), list(tds))
+    out, done = run.open_counts(expected.shape)
+    # an interrupted run has counted some of the pairs
+    done[:2, :] = True
+    out[:2, :] = expected[:2, :]
+    run.flush()
+
+    run = ResumableRun(str(tmp_path / 'work'))
+    patterns, tds = run.load_patterns()
+    out, done = run.open_counts(expected.shape)
+    calls = list()
+    def count_homs(pair_mask, **kwargs):
+        calls.append(pair_mask.copy())
+        return HomDP(pair_mask=pair_mask, **kwargs)
+    counts = count_patterns(count_homs, patterns, graphs, tds, min_embedding=True, fast_paths=False, out=out, done=done)
+    assert np.all(counts == expected)
+    assert np.all(done)
+    assert not np.any(calls[0][:2, :])
+    run.remove()
+    assert not (tmp_path / 'work').exists()
+
+
+def test_degree_bounds():
+    from ghc.utils.modular import degree_log2_bounds, graph_degree_arrays, predicted_overflow
+    patterns = [path4()[0], cycle4()[0], star_with_isolated()[0], triangle()[0]]
+    graph_sizes, max_degrees = graph_degree_arrays(graphs)
+    for pattern in patterns:
+        bounds = degree_log2_bounds(pattern, graph_sizes, max_degrees)
+        assert all(brute_force_hom(pattern, g) <= 2 ** b * (1 + 1e-9) for g, b in zip(graphs, bounds))
+    # hom(P_k, K_n) = n (n-1)^(k-1) is attained by the bound
+    assert np.isclose(degree_log2_bounds(nx.path_graph(5), [10], [9])[0], np.log2(10 * 9 ** 4))
+    overflow = predicted_overflow([nx.path_graph(20), nx.path_graph(3)], [10, 1000], [9, 999])
+    assert overflow.tolist() == [[True, False], [True, False]]
+
+
+@pytest.mark.parametrize("pattern, width", [(nx.cycle_graph(7), 2), (nx.petersen_graph(), 4), (nx.convert_node_labels_to_integers(nx.grid_2d_graph(3, 3)), 3), 
+                                            (star_with_isolated()[0], 1), (nx.empty_graph(3), 0)])
+def test_pattern_tree_decomposition(pattern, width):
+    td = pattern_tree_decomposition(pattern)
+    bags, td_edges = parse_PACE_td(td)
+    assert max(len(bag) for bag in bags) == width + 1
+    tree = nx.Graph(td_edges)
+    tree.add_nodes_from(range(len(bags)))
+    assert nx.is_tree(tree)
+    assert all(nx.is_connected(tree.subgraph([i for i, bag in enumerate(bags) if v in bag])) for v in pattern.nodes)
+    assert np.array_equal(HomDP([pattern], graphs[:3], [td]), HomDP([pattern], graphs[:3], [single_bag_td(pattern)]))
+    # a decomposition that is not wider is kept
+    assert pattern_tree_decomposition(nx.path_graph(4), td=path4()[1]) == path4()[1]
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_count_patterns_factorized(exact):
+    triangle_and_isolated = nx.disjoint_union(nx.cycle_graph(3), nx.empty_graph(1))
+    two_triangles = nx.disjoint_union(nx.cycle_graph(3), nx.cycle_graph(3))
+    patterns = [triangle_and_isolated, two_triangles, nx.disjoint_union(nx.cycle_graph(4), nx.complete_graph(3))]
+    tds = [pattern_tree_decomposition(p) for p in patterns]
+    counts = count_patterns(partial(HomDP, exact=exact), patterns, graphs[:4], tds, exact=exact)
+    assert np.array_equal(counts, count_patterns(partial(HomDP, exact=exact), patterns, graphs[:4], tds, exact=exact, factorize=False))
+    for ig, g in enumerate(graphs[:4]):
+        assert counts[ig, 0] == brute_force_hom(triangle_and_isolated, g)
+
+    # products that overflow int64 are marked as failed
+    large = nx.disjoint_union_all([nx.complete_graph(4) for _ in range(3)])
+    assert count_patterns(HomDP, [large], [nx.complete_graph(40)], [single_bag_td(large)])[0, 0] == -1
+
+
+def test_count_factorized_log():
+    from ghc.utils.counting import count_factorized
+    two_edges = nx.disjoint_union(nx.path_graph(2), nx.path_graph(2))
+    edge_and_isolated = nx.disjoint_union(nx.path_graph(2), nx.empty_graph(1))
+    log_counts = count_factorized(partial(HomDP, log=True), [two_edges, edge_and_isolated], [nx.empty_graph(0), nx.path_graph(3)], log=True)
+    # the graph without vertices has no homomorphisms, but no undefined products
+    assert np.all(np.isneginf(log_counts[0]))
+    assert np.allclose(log_counts[1], [np.log(16), np.log(12)])
+
+
+def test_log_hom_features():
+    from ghc.utils.converter import log_hom_features
+    counts = np.array([[1, 0, 8], [4, 2, 0]])
+    with np.errstate(divide='ignore'):
+        log_counts = np.log(counts)
+    features = log_hom_features(log_counts, [1, 2, 3], [2, 4])
+    assert np.allclose(features[counts > 0], np.log(counts[counts > 0])) and np.all(np.isneginf(features[counts == 0]))
+    # densities hom(F,G) / n^|V(F)| and an explicit value for zero counts
+    densities = log_hom_features(log_counts, [1, 2, 3], [2, 4], density=True, fill=1.)
+    assert np.allclose(densities, [[np.log(1 / 2), 1., np.log(8 / 8)], [np.log(4 / 4), np.log(2 / 16), 1.]])
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(exact=True), dict(log=True), dict(min_embedding=True, pair_mask=np.eye(5, 4, dtype=bool))])
+def test_hom_dp_batch_graphs(kwargs):
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    batch_graphs = graphs + [nx.cycle_graph(6), nx.complete_graph(3), nx.empty_graph(0)]
+    if 'pair_mask' in kwargs:
+        kwargs['pair_mask'] = np.vstack([kwargs['pair_mask'], np.ones([3, 4], dtype=bool)])
+    counts = HomDP(list(patterns), batch_graphs, list(tds), **kwargs)
+    # small limits force several batches
+    batched = HomDP(list(patterns), batch_graphs, list(tds), batch_graphs=True, max_batch_elements=2**7, **kwargs)
+    assert np.allclose(counts.astype(np.float64), batched.astype(np.float64))
+
+
+def test_zero_pairs():
+    from ghc.utils.invariants import graph_invariants, zero_pairs
+    patterns = [path4()[0], cycle4()[0], triangle()[0], nx.complete_graph(4), nx.cycle_graph(5)]
+    zero = zero_pairs(patterns, graph_invariants(graphs))
+    for ig, g in enumerate(graphs):
+        for jp, p in enumerate(patterns):
+            # pruned pairs are zero
+            assert not zero[ig, jp] or brute_force_hom(p, g) == 0
+    # the odd cycles do not map to the path, K4 does not map to C5, no pattern maps to the edgeless graph
+    assert zero[0].tolist() == [False, False, True, True, True]
+    assert zero[1].tolist() == [False, False, False, True, False]
+    assert zero[4].tolist() == [True] * 5
+
+    tds = [single_bag_td(p) for p in patterns]
+    counts = count_patterns(HomDP, patterns, graphs, tds, fast_paths=False)
+    assert np.array_equal(counts, count_patterns(HomDP, patterns, graphs, tds, fast_paths=False, prune=False))
+
+
+def test_graph_invariants():
+    from ghc.utils.invariants import graph_invariants
+    loop = nx.path_graph(4)
+    loop.add_edge(2, 2)
+    # one bipartite and one odd component
+    mixed = nx.disjoint_union(nx.path_graph(3), nx.cycle_graph(5))
+    test_graphs = graphs + [loop, mixed, nx.empty_graph(0), nx.wheel_graph(7)]
+    invariants = graph_invariants(test_graphs)
+    assert invariants['bipartite'].tolist() == [nx.is_bipartite(g) for g in test_graphs]
+    assert invariants['edges'].tolist() == [g.number_of_edges() for g in test_graphs]
+    assert invariants['loops'].tolist() == [nx.number_of_selfloops(g) > 0 for g in test_graphs]
+    loopless = [nx.Graph(g) for g in test_graphs]
+    for g in loopless:
+        g.remove_edges_from(nx.selfloop_edges(g))
+    assert invariants['clique_bound'].tolist() == [max(nx.core_number(g).values(), default=-1) + 1 for g in loopless]
+
+
+def test_graph_store(tmp_path):
+    from ghc.utils.graph_store import GraphStore
+    from ghc.utils.modular import graph_degree_arrays
+    loop = nx.cycle_graph(3)
+    loop.add_edge(1, 1)
+    store_graphs = graphs + [loop, nx.empty_graph(0)]
+    GraphStore.from_graphs(store_graphs).save(tmp_path / 'graphs.npz')
+    store = GraphStore.load(tmp_path / 'graphs.npz')
+    assert len(store) == len(store_graphs)
+    for g, h in zip(store_graphs, store):
+        g = nx.convert_node_labels_to_integers(g)
+        assert list(h.nodes) == list(g.nodes) and {frozenset(e) for e in h.edges} == {frozenset(e) for e in g.edges}
+    # materialized graphs are reused while they are referenced
+    assert store[3] is store[3]
+
+    for a, b in zip(dataset_adjacency(store_graphs), dataset_adjacency(store)):
+        assert (a != b).nnz == 0
+    assert all(np.array_equal(a, b) for a, b in zip(graph_degree_arrays(store_graphs), graph_degree_arrays(store)))
+    patterns, tds = zip(path4(), cycle4(), star_with_isolated(), triangle())
+    for kwargs in [dict(), dict(batch_graphs=True)]:
+        assert np.array_equal(HomDP(list(patterns), store_graphs, list(tds), **kwargs), HomDP(list(patterns), store, list(tds), **kwargs))
+    assert np.array_equal(pair_costs(list(patterns), store_graphs, list(tds)), pair_costs(list(patterns), store, list(tds)))
+    from ghc.utils.HomSubio import PACE_graph_strings
+    assert PACE_graph_strings(store) == PACE_graph_strings(store_graphs)
+
+
+def test_persisted_invariants(tmp_path):
+    from ghc.utils.graph_store import GraphStore
+    from ghc.utils.invariants import graph_invariants, pattern_invariants
+    store = GraphStore.from_graphs(graphs)
+    store.invariants = graph_invariants(graphs)
+    store.save(tmp_path / 'graphs.npz')
+    loaded = GraphStore.load(tmp_path / 'graphs.npz')
+    invariants = graph_invariants(loaded)
+    assert invariants is loaded.invariants
+    assert all(np.array_equal(invariants[key], value) for key, value in graph_invariants(graphs).items())
+
+    # kept pattern invariants are recomputed after an edit that keeps the sizes
+    pattern = nx.path_graph(4)
+    assert pattern_invariants(pattern)['clique'] == 2
+    pattern.remove_edge(2, 3)
+    pattern.add_edge(0, 2)
+    assert pattern_invariants(pattern)['clique'] == 3
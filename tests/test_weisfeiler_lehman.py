@@ -0,0 +1,13 @@
+import numpy as np
+import networkx as nx
+from ghc.utils.fast_weisfeiler_lehman import graph_isomorphism_classes
+
+
+def test_graph_isomorphism_classes():
+    relabeled = nx.relabel_nodes(nx.path_graph(5), {0: 4, 1: 2, 2: 0, 3: 1, 4: 3})
+    # two triangles and a hexagon are not distinguished by WL, but are not isomorphic
+    two_triangles = nx.disjoint_union(nx.cycle_graph(3), nx.cycle_graph(3))
+    graphs = [nx.path_graph(5), nx.cycle_graph(6), relabeled, two_triangles, nx.empty_graph(0), nx.cycle_graph(6)]
+    unique, inverse = graph_isomorphism_classes(graphs)
+    assert list(unique) == [0, 1, 3, 4]
+    assert list(inverse) == [0, 1, 0, 2, 3, 1]